@@ -0,0 +1,178 @@
+""" Analiza audita iz audit_log: pokrivenost po kategoriji, danu i djelatniku, neviđena oprema
+
+Iz baze se čitaju samo cijeli brojevi (id opreme i Unix vrijeme) preko indeksa, a sve
+grupiranje se radi vektorski u NumPy/pandas, pa i deseci milijuna skenova stanu u
+nekoliko sekundi i u memoriju od 16 bajtova po skenu.
+
+    python analytics.py                       # sažetak u konzoli
+    python analytics.py --days 90 --chart audit.png
+"""
+import argparse
+import time
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+import db
+
+DAY = 86400
+FETCH_SIZE = 1_000_000
+
+# Last scan per item, one probe into (equipment_id, ts) each; -1 when never scanned
+LAST_SEEN_QUERY = '''
+    SELECT id, IFNULL((SELECT MAX(ts) FROM audit_log WHERE equipment_id = equipment.id), -1) FROM equipment
+'''
+SCANS_QUERY = "SELECT equipment_id, ts FROM audit_log WHERE ts >= ? AND ts <= ? ORDER BY ts"
+
+def _int_columns(conn, query, params=(), columns=2):
+    """ Rezultat upita s cjelobrojnim stupcima kao NumPy polja, čitano u komadima """
+    cursor = conn.execute(query, params)
+    parts = []
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * columns)
+        parts.append(flat.reshape(-1, columns))
+    data = np.concatenate(parts) if parts else np.empty((0, columns), dtype=np.int64)
+    return [data[:, i] for i in range(columns)]
+
+def load_items(conn):
+    """ Sva oprema s kategorijom i djelatnikom kojem je trenutno dodijeljena """
+    return pd.read_sql_query(
+        "SELECT id, name, category, assigned_employee_id, assigned_to FROM equipment_view", conn, index_col="id")
+
+def last_seen(conn):
+    """ Zadnji sken po opremi (Unix vrijeme), -1 ako nikad nije skenirana
+
+    Jedan skok u indeks (equipment_id, ts) po komadu opreme, pa trajanje ovisi o
+    broju opreme, a ne o broju skenova.
+    """
+    equipment_ids, ts = _int_columns(conn, LAST_SEEN_QUERY)
+    return pd.Series(np.where(ts < 0, np.nan, ts), index=equipment_ids, name="last_seen")
+
+def _cutoff(days, now=None):
+    return int(now if now is not None else time.time()) - days * DAY
+
+def _with_last_seen(conn, days, now):
+    items = load_items(conn)
+    items["last_seen"] = last_seen(conn).reindex(items.index)
+    items["seen"] = items["last_seen"] >= _cutoff(days, now)
+    return items
+
+def _coverage(items, by):
+    grouped = items.groupby(by, dropna=False)["seen"].agg(["size", "sum"])
+    grouped.columns = ["items", "seen"]
+    grouped["coverage"] = grouped["seen"] / grouped["items"]
+    return grouped.sort_values("coverage")
+
+def coverage_by_category(conn, days=90, now=None):
+    """ Po kategoriji: broj komada, koliko ih je skenirano u zadnjih `days` dana i udio """
+    return _coverage(_with_last_seen(conn, days, now), "category")
+
+def coverage_by_employee(conn, days=90, now=None):
+    """ Isto po djelatniku kojem je oprema dodijeljena; slobodna oprema je pod 'Slobodno' """
+    return _coverage(_with_last_seen(conn, days, now), "assigned_to")
+
+def coverage_by_day(conn, days=30, now=None):
+    """ Po danu (UTC): broj skenova, broj različitih komada i udio u ukupnoj opremi """
+    end = int(now if now is not None else time.time())
+    start = _cutoff(days, end) // DAY * DAY
+    equipment_ids, ts = _int_columns(conn, SCANS_QUERY, (start, end))
+    total = conn.execute("SELECT COUNT(*) FROM equipment").fetchone()[0]
+
+    # Every day of the range, also the ones without scans at the end: those are the gaps to see
+    day = (ts - start) // DAY
+    number_of_days = (end - start) // DAY + 1
+    scans = np.bincount(day, minlength=number_of_days)
+
+    # Rows come in ts order, so each day is one slice; a reused bitmap over ids counts
+    # the distinct items of a day without sorting or hashing all the scans
+    bounds = np.searchsorted(day, np.arange(number_of_days + 1))
+    seen = np.zeros(int(equipment_ids.max()) + 1 if len(equipment_ids) else 1, dtype=bool)
+    distinct = np.zeros(number_of_days, dtype=np.int64)
+    for i in range(number_of_days):
+        ids = equipment_ids[bounds[i]:bounds[i + 1]]
+        seen[ids] = True
+        distinct[i] = np.count_nonzero(seen)
+        seen[ids] = False
+
+    result = pd.DataFrame({"scans": scans, "items": distinct},
+                          index=pd.to_datetime(start + np.arange(number_of_days) * DAY, unit="s"))
+    result.index.name = "day"
+    result["coverage"] = result["items"] / total if total else 0.0
+    return result
+
+def stale_items(conn, days=90, now=None, limit=None):
+    """ Oprema koja nije skenirana u zadnjih `days` dana, najdulje neviđena prva (nikad skenirana na vrhu) """
+    items = _with_last_seen(conn, days, now)
+    stale = items[~items["seen"]].sort_values("last_seen", na_position="first")
+    stale = stale.assign(last_seen=pd.to_datetime(stale["last_seen"], unit="s")).drop(columns="seen")
+    return stale.head(limit) if limit else stale
+
+def report(conn, days=90, now=None, stale_limit=100):
+    """ Sve za izvještaj odjednom, oprema i zadnji skenovi se čitaju samo jednom """
+    items = _with_last_seen(conn, days, now)
+    stale = items[~items["seen"]].sort_values("last_seen", na_position="first")
+    return {
+        "days": days,
+        "by_category": _coverage(items, "category"),
+        "by_employee": _coverage(items, "assigned_to"),
+        "by_day": coverage_by_day(conn, min(days, 60), now),
+        "stale_count": len(stale),
+        "stale": stale.head(stale_limit).assign(last_seen=lambda df: pd.to_datetime(df["last_seen"], unit="s")),
+    }
+
+# Charts
+def plot_report(figure, data):
+    """ Crta pokrivenost po kategoriji, po danu i po djelatniku (najslabijih 10) na zadanu matplotlib Figure """
+    days = data["days"]
+    by_category = data["by_category"]
+    by_employee = data["by_employee"].head(10)
+    by_day = data["by_day"]
+
+    figure.clear()
+    axes = figure.subplots(3, 1)
+
+    axes[0].barh(by_category.index.astype(str), by_category["coverage"] * 100, color="tab:blue")
+    axes[0].set_title(f"Pokrivenost po kategoriji (zadnjih {days} dana)")
+    axes[0].set_xlim(0, 100)
+    axes[0].set_xlabel("%")
+
+    axes[1].bar(by_day.index, by_day["items"], color="tab:green")
+    axes[1].set_title("Različita oprema skenirana po danu")
+    axes[1].tick_params(axis="x", labelrotation=30, labelsize=8)
+
+    axes[2].barh(by_employee.index.astype(str), by_employee["coverage"] * 100, color="tab:orange")
+    axes[2].set_title("Najslabija pokrivenost po djelatniku")
+    axes[2].tick_params(axis="y", labelsize=8)
+    axes[2].set_xlim(0, 100)
+    axes[2].set_xlabel("%")
+
+    figure.tight_layout()
+    return figure
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--stale", type=int, default=20, help="koliko neviđenih komada ispisati")
+    parser.add_argument("--chart", help="spremi grafove u .png/.pdf")
+    args = parser.parse_args()
+
+    with db.connection() as conn:
+        print(coverage_by_category(conn, args.days).to_string())
+        print()
+        print(coverage_by_day(conn, min(args.days, 30)).to_string())
+        print()
+        print(stale_items(conn, args.days, limit=args.stale)[["name", "category", "assigned_to", "last_seen"]].to_string())
+
+        if args.chart:
+            from matplotlib.figure import Figure
+
+            figure = plot_report(Figure(figsize=(10, 12)), report(conn, args.days))
+            figure.savefig(args.chart)
+            print(f"Grafovi spremljeni u '{args.chart}'")
+
+if __name__ == "__main__":
+    main()
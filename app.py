@@ -1,83 +1,466 @@
 import sys
-import sqlite3
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
-    QTableWidget, QTableWidgetItem, QComboBox, QLineEdit, QMessageBox, QFileDialog
+    QTableWidget, QTableWidgetItem, QComboBox, QLineEdit, QMessageBox, QFileDialog,
+    QTableView, QStyledItemDelegate, QStyleOptionButton, QStyle, QLabel, QProgressDialog, QCompleter
 )
-from PyQt6.QtCore import Qt, pyqtSignal
-import qrcode
-import random
-import pandas as pd
-import matplotlib.pyplot as plt
-
-import qrcode.constants
-
-def generate_unique_id(database, table):
-    conn = sqlite3.connect(database)
-    cursor = conn.cursor()
-    while True:
-        random_id = random.randint(0, 9999)
-        cursor.execute(f"SELECT id FROM {table} WHERE id = ?", (random_id,))
-        if cursor.fetchone() is None:
-            conn.close()
-            return random_id
-
-# Database Setup
-def setup_databases():
-    # Inventory Database
-    conn_inv = sqlite3.connect("inventory.db")
-    cursor_inv = conn_inv.cursor()
-    cursor_inv.execute('''
-        CREATE TABLE IF NOT EXISTS equipment (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            category TEXT NOT NULL,
-            assigned_to TEXT DEFAULT 'Slobodno',
-            last_audit TEXT
-        )
-    ''')
-    conn_inv.commit()
-    conn_inv.close()
-
-    # Employees Database
-    conn_emp = sqlite3.connect("employees.db")
-    cursor_emp = conn_emp.cursor()
-    cursor_emp.execute('''
-        CREATE TABLE IF NOT EXISTS employees (
-            id INTEGER PRIMARY KEY,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            company TEXT NOT NULL
+from PyQt6.QtCore import (
+    Qt, pyqtSignal, QAbstractTableModel, QModelIndex, QEvent, QObject, QRunnable, QThreadPool, QTimer
+)
+from PyQt6.QtGui import QColor, QPalette, QStandardItem, QStandardItemModel
+
+import db
+import metrics
+from cache import InventoryCache, display_name
+from exporter import count_equipment, export_equipment
+from fts import equipment_page_query
+from importer import count_rows, import_file
+from labels import QR_RENDER_SECONDS, regenerate_labels, write_search_sheets
+from search import SEARCH_SECONDS, SearchPipeline
+
+CATEGORIES = ["Monitor", "Kučište", "Miš", "Tipkovnica", "Laptop"]
+
+TABLE_APPEND_SECONDS = metrics.Histogram("inventory_qt_table_append_seconds",
+                                         "Dodavanje komada redaka u model tablice, s osvježavanjem prikaza")
+
+# Equipment Table Model
+class EquipmentTableModel(QAbstractTableModel):
+    """ Model opreme koji dohvaća retke iz baze po stranicama, kako korisnik skrola """
+    HEADERS = ["ID", "Naziv", "Kategorija", "Dodijeljeno", "Akcije", "Obriši"]
+    PAGE_SIZE = 200
+
+    # generation, last loaded id; the search pipeline runs the query off the GUI thread
+    page_requested = pyqtSignal(int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._positions = {}
+        self._search_text = ""
+        self._category = None
+        self._has_more = False
+        self._loading = False
+        self.generation = 0
+
+    def set_filter(self, search_text, category):
+        # Rows of an older search that are still in flight get dropped
+        self.generation += 1
+
+        self.beginResetModel()
+        self._rows = []
+        self._positions = {}
+        self._search_text = search_text
+        self._category = category if category != "Sve kategorije" else None
+        self._has_more = True
+        self._loading = False
+        self.endResetModel()
+
+        # First page right away, the view asks for the rest while scrolling
+        self.fetchMore()
+
+    def page_query(self, after_id):
+        # Keyset paging on id, so every page is an index range scan
+        return equipment_page_query(self._search_text, self._category, after_id, self.PAGE_SIZE)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.UserRole:
+            return row
+        if role == Qt.ItemDataRole.DisplayRole and index.column() < 4:
+            return str(row[index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+
+        self._loading = True
+        last_id = self._rows[-1][0] if self._rows else -1
+        self.page_requested.emit(self.generation, last_id)
+
+    def append_rows(self, generation, rows):
+        if generation != self.generation or not rows:
+            return
+
+        with TABLE_APPEND_SECONDS.time():
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._rows.extend(rows)
+            for position, row in enumerate(rows, start=first):
+                self._positions[row[0]] = position
+            self.endInsertRows()
+
+    def update_rows(self, rows):
+        """ Zamjenjuje već učitane retke novim verzijama; nepoznati retci (npr. dodani u drugom procesu) idu u insert_rows """
+        changed = []
+        unknown = []
+        for row in rows:
+            position = self._positions.get(row[0])
+            if position is None:
+                unknown.append(row)
+            elif self._rows[position] != row:
+                self._rows[position] = row
+                changed.append(position)
+
+        # One repaint for a bulk change, rows between the changed ones are only redrawn
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), 0), self.index(max(changed), len(self.HEADERS) - 1))
+        if unknown:
+            self.insert_rows(unknown)
+
+    def remove_ids(self, equipment_ids):
+        """ Uklanja retke s tim id-evima; pomak prikaza i odabir ostalih redaka ostaju """
+        positions = sorted((self._positions[i] for i in equipment_ids if i in self._positions), reverse=True)
+        if not positions:
+            return
+
+        # Adjacent rows go in one removal, from the bottom so earlier positions stay valid
+        runs = []
+        for position in positions:
+            if runs and runs[-1][0] == position + 1:
+                runs[-1][0] = position
+            else:
+                runs.append([position, position])
+
+        for first, last in runs:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for row in self._rows[first:last + 1]:
+                del self._positions[row[0]]
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+
+        for position in range(positions[-1], len(self._rows)):
+            self._positions[self._rows[position][0]] = position
+
+    def insert_rows(self, rows):
+        """ Nova oprema (najveći id-evi) ide na kraj, ako je sve učitano i odgovara trenutnoj pretrazi
+
+        Dok ima neučitanih stranica, novi redak stiže s posljednjom stranicom.
+        """
+        if self._has_more or self._loading:
+            return
+
+        last_id = self._rows[-1][0] if self._rows else -1
+        new = [row for row in sorted(rows) if row[0] > last_id and self.matches(row[0])]
+        if new:
+            self.append_rows(self.generation, new)
+
+    def matches(self, equipment_id):
+        query, params = equipment_page_query(self._search_text, self._category, equipment_id - 1, 1)
+        with db.connection() as conn:
+            row = conn.execute(query, params).fetchone()
+        return row is not None and row[0] == equipment_id
+
+    def loaded_ids(self):
+        return list(self._positions)
+
+    def finish_page(self, generation, has_more):
+        if generation != self.generation:
+            return
+
+        self._loading = False
+        self._has_more = has_more
+
+# Cost of the last table refresh in the corner of the table, only with INVENTORY_METRICS=1
+class DebugOverlay(QLabel):
+    REFRESH_MS = 500
+
+    def __init__(self, table):
+        super().__init__(table)
+        self.table = table
+        self.setStyleSheet("background: rgba(0, 0, 0, 170); color: white; padding: 6px; font-family: monospace;")
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        table.installEventFilter(self)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+        self.refresh()
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Resize:
+            self.reposition()
+        return False
+
+    def reposition(self):
+        self.adjustSize()
+        self.move(self.table.width() - self.width() - 20, self.table.horizontalHeader().height() + 10)
+        self.raise_()
+
+    def refresh(self):
+        def ms(histogram, *labels):
+            seconds = histogram.last(*labels)
+            return "-" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+        self.setText(
+            f"pretraga do prve stranice  {ms(SEARCH_SECONDS)}\n"
+            f"upit / čitanje redaka      {ms(db.QUERY_SECONDS, 'search_page')} / {ms(db.FETCH_SECONDS, 'search_page')}\n"
+            f"model tablice (komad)      {ms(TABLE_APPEND_SECONDS)}\n"
+            f"QR naljepnica              {ms(QR_RENDER_SECONDS)}\n"
+            f"učitano redaka             {self.table.model().rowCount()}"
         )
-    ''')
-    conn_emp.commit()
-    conn_emp.close()
-
-# Generate QR Code
-def generate_qr_code(equipment_id, file_name):
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(str(equipment_id))
-    qr.make(fit=True)
-
-    img = qr.make_image(fill='black', back_color='white')
-    img.save(file_name)
-
-def export_to_excel():
-    file_path,_ = QFileDialog.getSaveFileName(None, "Spremi izvještaj", "", "Excel datoteke (*.xlsx)")
-    if not file_path:
-        return
-    
-    conn = sqlite3.connect("inventory.db")
-    df = pd.read_sql_query("SELECT * FROM equipment", conn)
-    conn.close()
-
-    df.to_excel(file_path, index=False)
-    QMessageBox.information(None, "Izvoz završen", f"Izvještaj spremljen kao '{file_path}'.")
+        self.reposition()
+
+# Employee Picker
+class EmployeePicker(QLineEdit):
+    """ Odabir djelatnika upisom: prijedlozi iz EmployeeIndex za svaku promjenu teksta
+
+    Popup ima samo prvih SUGGESTIONS pogodaka, pa ni jedan upis ne ovisi o broju
+    djelatnika. currentData() vraća id odabranog djelatnika ili None, kao QComboBox.
+    """
+    SUGGESTIONS = 20
+
+    def __init__(self, cache, placeholder="Upišite ime, prezime ili tvrtku", parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._employee_id = None
+        self.setPlaceholderText(placeholder)
+        self.setClearButtonEnabled(True)
+
+        # The index already filtered, the completer only shows what it is given
+        self._suggestions = QStandardItemModel(self)
+        self._completer = QCompleter(self._suggestions, self)
+        self._completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self._completer.setMaxVisibleItems(10)
+        self._completer.setWidget(self)
+        self._completer.activated[QModelIndex].connect(self._choose)
+
+        self.textEdited.connect(self._suggest)
+
+    def _suggest(self, text):
+        self._employee_id = None
+        self._suggestions.clear()
+        for employee in self.cache.employee_index.search(text, self.SUGGESTIONS):
+            item = QStandardItem(display_name(employee))
+            item.setData(employee[0], Qt.ItemDataRole.UserRole)
+            self._suggestions.appendRow(item)
+
+        if self._suggestions.rowCount():
+            self._completer.complete()
+        else:
+            self._completer.popup().hide()
+
+    def _choose(self, index):
+        self._employee_id = index.data(Qt.ItemDataRole.UserRole)
+        self.setText(index.data(Qt.ItemDataRole.DisplayRole))
+
+    def currentData(self):
+        # A chosen employee may have been deleted since
+        if self._employee_id is None or self.cache.employees.position(self._employee_id) is None:
+            return None
+        return self._employee_id
+
+    def clear(self):
+        self._employee_id = None
+        super().clear()
+
+# Button Delegate
+class ButtonDelegate(QStyledItemDelegate):
+    """ Crta gumb u ćeliji umjesto stvarnog widgeta po retku """
+    clicked = pyqtSignal(object)
+
+    def __init__(self, button_for_row, parent=None):
+        super().__init__(parent)
+        # button_for_row(row) -> (text, background color or None, text color or None)
+        self.button_for_row = button_for_row
+
+    def paint(self, painter, option, index):
+        row = index.data(Qt.ItemDataRole.UserRole)
+        text, background, foreground = self.button_for_row(row)
+
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(8, 12, -8, -12)
+        button.text = text
+        button.state = QStyle.StateFlag.State_Enabled
+        if background:
+            button.palette.setColor(QPalette.ColorRole.Button, QColor(background))
+        if foreground:
+            button.palette.setColor(QPalette.ColorRole.ButtonText, QColor(foreground))
+
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and option.rect.contains(event.position().toPoint())):
+            self.clicked.emit(index.data(Qt.ItemDataRole.UserRole))
+            return True
+        return False
+
+# Background Import
+class ImportSignals(QObject):
+    total = pyqtSignal(int)  # rows in the file, 0 if not known
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+class ImportWorker(QRunnable):
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.signals = ImportSignals()
+        self.cancelled = False
+
+    def run(self):
+        try:
+            # Counting reads the whole file too, so it is done here and not before the dialog shows
+            self.signals.total.emit(count_rows(self.path) or 0)
+            summary = import_file(self.path, progress=self.signals.progress.emit, cancelled=lambda: self.cancelled)
+        except Exception as e:
+            # Any error has to reach the window, otherwise the modal dialog never closes
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(summary)
+
+# Background Export
+class ExportSignals(QObject):
+    total = pyqtSignal(int)
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)  # rows written, None if cancelled
+    failed = pyqtSignal(str)
+
+class ExportWorker(QRunnable):
+    def __init__(self, path, search_text, category):
+        super().__init__()
+        self.path = path
+        self.search_text = search_text
+        self.category = category
+        self.signals = ExportSignals()
+        self.cancelled = False
+
+    def run(self):
+        try:
+            self.signals.total.emit(count_equipment(self.search_text, self.category))
+            written = export_equipment(self.path, self.search_text, self.category,
+                                       progress=self.signals.progress.emit, cancelled=lambda: self.cancelled)
+        except Exception as e:
+            # Any error has to reach the window, otherwise the modal dialog never closes
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(written)
+
+# Background Labels
+class LabelSignals(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+class LabelWorker(QRunnable):
+    """ Pokreće funkciju iz labels.py u pozadini: regenerate_labels ili write_search_sheets """
+    def __init__(self, function, *args):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.signals = LabelSignals()
+
+    def run(self):
+        try:
+            result = self.function(*self.args, progress=self.signals.progress.emit)
+        except Exception as e:
+            # Any error has to reach the window, otherwise the modal dialog never closes
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(result)
+
+# Audit Analytics
+class AnalyticsSignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+class AnalyticsWorker(QRunnable):
+    def __init__(self, days):
+        super().__init__()
+        self.days = days
+        self.signals = AnalyticsSignals()
+
+    def run(self):
+        try:
+            # NumPy and pandas come with it, only once the window is opened
+            import analytics
+
+            with db.connection() as conn:
+                data = analytics.report(conn, self.days)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(data)
+
+class AnalyticsWindow(QWidget):
+    """ Pokrivenost audita iz audit_log: grafovi i popis opreme koja dugo nije skenirana """
+    def __init__(self):
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+
+        super().__init__()
+        self.setWindowTitle("Analitika audita")
+        self.setGeometry(200, 100, 900, 900)
+
+        layout = QVBoxLayout()
+
+        controls = QHBoxLayout()
+        self.days_select = QComboBox()
+        for days in (30, 90, 180, 365):
+            self.days_select.addItem(f"Zadnjih {days} dana", days)
+        self.days_select.setCurrentIndex(1)
+        self.days_select.currentIndexChanged.connect(self.load_report)
+        controls.addWidget(self.days_select)
+
+        self.status_label = QLabel()
+        controls.addWidget(self.status_label)
+        layout.addLayout(controls)
+
+        self.figure = Figure(figsize=(9, 10))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        layout.addWidget(self.canvas, stretch=3)
+
+        self.stale_table = QTableWidget()
+        self.stale_table.setColumnCount(5)
+        self.stale_table.setHorizontalHeaderLabels(["ID", "Naziv", "Kategorija", "Dodijeljeno", "Zadnji sken"])
+        layout.addWidget(self.stale_table, stretch=1)
+
+        self.setLayout(layout)
+        self.load_report()
+
+    def load_report(self):
+        self.status_label.setText("Računam...")
+        self.worker = AnalyticsWorker(self.days_select.currentData())
+        self.worker.signals.finished.connect(self.show_report)
+        self.worker.signals.failed.connect(lambda error: self.status_label.setText(f"Greška: {error}"))
+        QThreadPool.globalInstance().start(self.worker)
+
+    def show_report(self, data):
+        import analytics
+        import pandas as pd
+
+        analytics.plot_report(self.figure, data)
+        self.canvas.draw_idle()
+
+        stale = data["stale"]
+        self.status_label.setText(f"Nije skenirano u zadnjih {data['days']} dana: {data['stale_count']} komada")
+        self.stale_table.setRowCount(len(stale))
+        for row_idx, (equipment_id, item) in enumerate(stale.iterrows()):
+            last_seen = "nikad" if pd.isna(item["last_seen"]) else str(item["last_seen"])
+            for col_idx, value in enumerate((equipment_id, item["name"], item["category"], item["assigned_to"], last_seen)):
+                self.stale_table.setItem(row_idx, col_idx, QTableWidgetItem(str(value)))
 
 # Employee Management Window
 class EmployeeWindow(QWidget):
@@ -110,11 +493,10 @@ class EmployeeWindow(QWidget):
 
         employee_added = pyqtSignal()
 
-        # Employee Table
-        self.employee_table = QTableWidget()
-        self.employee_table.setColumnCount(4)
-        self.employee_table.setHorizontalHeaderLabels(["ID", "Ime", "Prezime", "Tvrtka"])
-        self.load_employees()
+        # Employee Table, the same model as the dropdowns in the other windows
+        self.employee_table = QTableView()
+        self.employee_table.setModel(self.parent.cache.employees)
+        self.employee_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
         layout.addWidget(self.employee_table)
 
         # Delete Employee Button
@@ -128,18 +510,9 @@ class EmployeeWindow(QWidget):
 
         self.setLayout(layout)
 
-    # Load Employees into Table
-    def load_employees(self):
-        conn = sqlite3.connect("employees.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM employees")
-        rows = cursor.fetchall()
-        conn.close()
-
-        self.employee_table.setRowCount(len(rows))
-        for row_idx, row in enumerate(rows):
-            for col_idx, data in enumerate(row):
-                self.employee_table.setItem(row_idx, col_idx, QTableWidgetItem(str(data)))
+    def selected_employee(self):
+        index = self.employee_table.currentIndex()
+        return self.parent.cache.employees.employee(index.row()) if index.isValid() else None
 
     # Add New Employee
     def add_employee(self):
@@ -151,16 +524,12 @@ class EmployeeWindow(QWidget):
             QMessageBox.warning(self, "Greška", "Popunite sva polja!")
             return
         
-        employee_id = generate_unique_id("employees.db", "employees")
-        conn = sqlite3.connect("employees.db")
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO employees (id, first_name, last_name, company) VALUES (?, ?, ?, ?)", 
-                       (employee_id, first_name, last_name, company))
-        conn.commit()
-        conn.close()
-
-        self.load_employees()
-        self.parent.load_employees()  # Refresh dropdown in main window
+        with self.parent.cache.write() as conn:
+            cursor = conn.execute("INSERT INTO employees (first_name, last_name, company) VALUES (?, ?, ?)", 
+                                  (first_name, last_name, company))
+
+        # Table and dropdowns share the model, one inserted row updates all of them
+        self.parent.cache.employees.insert((cursor.lastrowid, first_name, last_name, company))
         self.first_name_input.clear()
         self.last_name_input.clear()
         self.company_input.clear()
@@ -168,52 +537,25 @@ class EmployeeWindow(QWidget):
 
     # Delete Selected Employee
     def delete_employee(self):
-        selected_row = self.employee_table.currentRow()
-        if selected_row < 0:
+        employee = self.selected_employee()
+        if employee is None:
             QMessageBox.warning(self, "Greška", "Odaberite djelatnika za brisanje!")
             return
 
-        employee_id = self.employee_table.item(selected_row, 0).text()
-        first_name = self.employee_table.item(selected_row, 1).text()
-        last_name = self.employee_table.item(selected_row, 2).text()
-        company = self.employee_table.item(selected_row, 3).text()
-
-        employee_name = f"{first_name} {last_name} ({company})"
-
-        conn_inv = sqlite3.connect("inventory.db")
-        cursor_inv = conn_inv.cursor()
-        cursor_inv.execute("UPDATE equipment SET assigned_to = 'Slobodno' WHERE assigned_to = ?", (employee_name,))
-        conn_inv.commit()
-        conn_inv.close()
-
-        conn_emp = sqlite3.connect("employees.db")
-        cursor_emp = conn_emp.cursor()
-        cursor_emp.execute("DELETE FROM employees WHERE id = ?", (employee_id,))
-        conn_emp.commit()
-        conn_emp.close()
-
-        self.load_employees()
-        self.parent.load_employees()  # Refresh dropdown in main window
-
-        self.parent.load_equipment()
+        self.parent.cache.delete_employee(employee[0])
 
     def show_assigned_equipment(self):
-        selected_row = self.employee_table.currentRow()
-        if selected_row < 0:
+        employee = self.selected_employee()
+        if employee is None:
             QMessageBox.warning(self, "Greška", "Odaberite djelatnika")
+            return
         
-        employee_id = self.employee_table.item(selected_row, 0).text()
-        first_name = self.employee_table.item(selected_row, 1).text()
-        last_name = self.employee_table.item(selected_row, 2).text()
-        company = self.employee_table.item(selected_row, 3).text()
+        employee_id, first_name, last_name, company = employee
 
         employee_name = f"{first_name} {last_name} ({company})"
 
-        conn = sqlite3.connect("inventory.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, category FROM equipment WHERE assigned_to = ?", (employee_name,))
-        rows = cursor.fetchall()
-        conn.close()
+        with db.connection() as conn:
+            rows = conn.execute("SELECT id, name, category FROM equipment WHERE assigned_employee_id = ?", (employee_id,)).fetchall()
 
         if not rows:
             QMessageBox.information(self, "Dodijeljena oprema", "Nema dodijeljene opreme za ovog djelatnika.")
@@ -255,20 +597,24 @@ class ITInventory(QWidget):
         self.name_input.setPlaceholderText("Naziv opreme")
 
         self.category_input = QComboBox()
-        self.category_input.addItems(["Monitor", "Kučište", "Miš", "Tipkovnica", "Laptop"])
+        self.category_input.addItems(CATEGORIES)
         
-        self.employee_select = QComboBox()
-        self.load_employees()
+        # Employees are read once and shared by every window
+        self.cache = InventoryCache(self)
+
+        # Left empty the new equipment is unassigned
+        self.employee_select = EmployeePicker(self.cache, "Slobodno (ili upišite djelatnika)", self)
 
         # Search Field
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("Pretraži opremu po nazivu")
-        self.search_input.textChanged.connect(self.load_equipment)
+        self.search_input.setPlaceholderText("Pretraži opremu (naziv, kategorija, djelatnik)")
 
         # Filter ComboBox
         self.filter_category = QComboBox()
-        self.filter_category.addItems(["Sve kategorije", "Monitor", "Kučište", "Miš", "Tipkovnica", "Laptop"])
-        self.filter_category.currentIndexChanged.connect(self.load_equipment)
+        self.filter_category.addItems(["Sve kategorije"] + CATEGORIES)
+
+        # Search Latency
+        self.search_stats_label = QLabel()
 
         # Buttons
         add_button = QPushButton("Dodaj opremu")
@@ -287,11 +633,28 @@ class ITInventory(QWidget):
         # Arrange Filter and Search
         filter_layout.addWidget(self.search_input)
         filter_layout.addWidget(self.filter_category)
+        filter_layout.addWidget(self.search_stats_label)
 
         # Table Setup
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "Naziv", "Kategorija", "Dodijeljeno", "Akcije", "Obriši"])
+        self.model = EquipmentTableModel(self)
+
+        # Searches are debounced and run on a worker thread
+        self.search_pipeline = SearchPipeline(self.model, self)
+        self.search_pipeline.debounced.connect(self.load_equipment)
+        self.search_pipeline.search_finished.connect(self.update_search_stats)
+        self.search_pipeline.search_failed.connect(lambda error: self.search_stats_label.setText(f"Greška: {error}"))
+        self.search_input.textChanged.connect(self.search_pipeline.schedule)
+        self.filter_category.currentIndexChanged.connect(self.search_pipeline.schedule)
+
+        # Changed rows are patched in place instead of reloading the table
+        self.cache.equipment_changed.connect(self.model.update_rows)
+        self.cache.equipment_inserted.connect(self.model.insert_rows)
+        self.cache.equipment_removed.connect(self.model.remove_ids)
+        self.cache.equipment_stale.connect(lambda: self.cache.refresh_equipment(self.model.loaded_ids()))
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.verticalHeader().setDefaultSectionSize(50)
         self.table.setColumnWidth(0, 50)
         self.table.setColumnWidth(1, 200)
         self.table.setColumnWidth(2, 150)
@@ -299,60 +662,214 @@ class ITInventory(QWidget):
         self.table.setColumnWidth(4, 100)
         self.table.setColumnWidth(5, 100)
 
+        # Ctrl/Shift + klik odabire više redaka za skupne akcije
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableView.SelectionMode.ExtendedSelection)
+
+        # Stupci "Akcije" i "Obriši" se crtaju delegatom
+        self.action_delegate = ButtonDelegate(self.action_button_for_row, self.table)
+        self.action_delegate.clicked.connect(self.on_action_clicked)
+        self.table.setItemDelegateForColumn(4, self.action_delegate)
+
+        self.delete_delegate = ButtonDelegate(lambda row: ("🗑️ Obriši", "red", "white"), self.table)
+        self.delete_delegate.clicked.connect(lambda row: self.delete_equipment([row[0]]))
+        self.table.setItemDelegateForColumn(5, self.delete_delegate)
+
+        if metrics.ENABLED:
+            self.debug_overlay = DebugOverlay(self.table)
+
+        # Bulk Actions on the selected rows, each one statement in one transaction
+        bulk_layout = QHBoxLayout()
+        self.selection_label = QLabel()
+
+        assign_selected_button = QPushButton("Dodijeli odabrano")
+        assign_selected_button.clicked.connect(lambda: self.open_assign_employee_window(self.selected_ids()))
+
+        unassign_selected_button = QPushButton("Odvoji odabrano")
+        unassign_selected_button.clicked.connect(lambda: self.unassign_equipment(self.selected_ids()))
+
+        self.bulk_category = QComboBox()
+        self.bulk_category.addItems(CATEGORIES)
+        category_selected_button = QPushButton("Promijeni kategoriju")
+        category_selected_button.clicked.connect(self.change_category)
+
+        delete_selected_button = QPushButton("Obriši odabrano")
+        delete_selected_button.clicked.connect(lambda: self.delete_equipment(self.selected_ids()))
+
+        self.bulk_buttons = [assign_selected_button, unassign_selected_button, category_selected_button,
+                             delete_selected_button]
+        bulk_layout.addWidget(self.selection_label)
+        bulk_layout.addWidget(assign_selected_button)
+        bulk_layout.addWidget(unassign_selected_button)
+        bulk_layout.addWidget(self.bulk_category)
+        bulk_layout.addWidget(category_selected_button)
+        bulk_layout.addWidget(delete_selected_button)
+
+        # Reset and removed rows change the selection without selectionChanged
+        self.table.selectionModel().selectionChanged.connect(self.update_selection)
+        self.model.modelReset.connect(self.update_selection)
+        self.model.rowsRemoved.connect(self.update_selection)
+        self.update_selection()
+
         # Add Layouts to Main
         main_layout.addLayout(input_layout)
         main_layout.addLayout(filter_layout)
         main_layout.addWidget(self.table)
+        main_layout.addLayout(bulk_layout)
+
+        # Add Button for Excel/CSV Import
+        import_button = QPushButton("Uvezi iz Excela/CSV-a")
+        import_button.clicked.connect(self.import_from_file)
+        main_layout.addWidget(import_button)
+
+        # Add Button for Printable Labels
+        labels_button = QPushButton("Ispiši QR naljepnice")
+        labels_button.clicked.connect(self.print_labels)
+        main_layout.addWidget(labels_button)
+
+        # Add Button for Audit Analytics
+        analytics_button = QPushButton("Analitika audita")
+        analytics_button.clicked.connect(self.show_analytics_window)
+        main_layout.addWidget(analytics_button)
 
         # Add Button for Excel Report
         export_button = QPushButton("Izvezi izvještaj u Excel")
-        export_button.clicked.connect(export_to_excel)
+        export_button.clicked.connect(self.export_report)
         main_layout.addWidget(export_button)
         
         self.setLayout(main_layout)
         self.load_equipment()
 
+    # Export Report (same search and category as the table)
+    def export_report(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Spremi izvještaj", "", "Excel datoteke (*.xlsx);;CSV datoteke (*.csv);;Parquet datoteke (*.parquet)")
+        if not file_path:
+            return
+
+        search_text = self.search_input.text().strip()
+        category = self.filter_category.currentText()
+        category = category if category != "Sve kategorije" else None
+
+        self.export_path = file_path
+        self.export_worker = ExportWorker(file_path, search_text, category)
+        self.export_dialog = QProgressDialog("Izvoz u tijeku...", "Prekini", 0, 0, self)
+        self.export_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.export_dialog.canceled.connect(lambda: setattr(self.export_worker, "cancelled", True))
+
+        self.export_worker.signals.total.connect(self.export_dialog.setMaximum)
+        self.export_worker.signals.progress.connect(self.export_dialog.setValue)
+        self.export_worker.signals.finished.connect(self.export_finished)
+        self.export_worker.signals.failed.connect(self.export_failed)
+        QThreadPool.globalInstance().start(self.export_worker)
+
+    def export_finished(self, written):
+        self.export_dialog.close()
+        if written is not None:
+            QMessageBox.information(self, "Izvoz završen", f"Izvještaj spremljen kao '{self.export_path}'.")
+
+    def export_failed(self, error):
+        self.export_dialog.close()
+        QMessageBox.warning(self, "Greška", f"Izvoz nije uspio: {error}")
+
+    # Label Sheets (same search and category as the table)
+    def print_labels(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Spremi naljepnice", "", "PDF datoteke (*.pdf);;PNG slike (*.png)")
+        if not file_path:
+            return
+
+        category = self.filter_category.currentText()
+        category = category if category != "Sve kategorije" else None
+
+        # Matching equipment is read by the worker as well, a large inventory takes a while
+        self.labels_path = file_path
+        self.labels_worker = LabelWorker(write_search_sheets, file_path, self.search_input.text().strip(), category)
+        self.labels_dialog = QProgressDialog("Izrada naljepnica...", None, 0, 0, self)
+        self.labels_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+
+        self.labels_worker.signals.progress.connect(self.labels_progress)
+        self.labels_worker.signals.finished.connect(self.labels_finished)
+        self.labels_worker.signals.failed.connect(self.labels_failed)
+        QThreadPool.globalInstance().start(self.labels_worker)
+
+    def labels_progress(self, done, total):
+        self.labels_dialog.setMaximum(total)
+        self.labels_dialog.setValue(done)
+
+    def labels_finished(self, pages):
+        self.labels_dialog.close()
+        if not pages:
+            # write_search_sheets writes no file when nothing matches
+            QMessageBox.information(self, "Naljepnice", "Nijedna oprema ne odgovara pretrazi, naljepnice nisu spremljene.")
+            return
+        QMessageBox.information(self, "Naljepnice", f"Spremljeno {pages} listova naljepnica u '{self.labels_path}'.")
+
+    def labels_failed(self, error):
+        self.labels_dialog.close()
+        QMessageBox.warning(self, "Greška", f"Izrada naljepnica nije uspjela: {error}")
+
+    # Import Equipment or Employees
+    def import_from_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Uvezi podatke", "", "Excel/CSV datoteke (*.xlsx *.csv)")
+        if not file_path:
+            return
+
+        self.import_worker = ImportWorker(file_path)
+        self.import_dialog = QProgressDialog("Uvoz u tijeku...", "Prekini", 0, 0, self)
+        self.import_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.import_dialog.canceled.connect(lambda: setattr(self.import_worker, "cancelled", True))
+
+        self.import_worker.signals.total.connect(self.import_dialog.setMaximum)
+        self.import_worker.signals.progress.connect(self.import_dialog.setValue)
+        self.import_worker.signals.finished.connect(self.import_finished)
+        self.import_worker.signals.failed.connect(self.import_failed)
+        QThreadPool.globalInstance().start(self.import_worker)
+
+    def import_finished(self, summary):
+        self.import_dialog.close()
+
+        message = f"Uvezeno redaka: {summary['imported']}, grešaka: {len(summary['errors'])}."
+        for line, error in summary["errors"][:10]:
+            message += f"\nRedak {line}: {error}"
+        if not summary["completed"]:
+            message += "\n\nUvoz je prekinut. Ponovni uvoz iste datoteke nastavlja gdje je stao."
+        QMessageBox.information(self, "Uvoz završen", message)
+
+        self.cache.reload_employees()
+        self.load_equipment()
+
+    def import_failed(self, error):
+        self.import_dialog.close()
+        QMessageBox.warning(self, "Greška", f"Uvoz nije uspio: {error}")
+
+    def show_analytics_window(self):
+        self.analytics_window = AnalyticsWindow()
+        self.analytics_window.show()
+
     # Show Employees Window
     def show_employees_window(self):
         self.employee_window = EmployeeWindow(self)
-        self.employee_window.employee_added.connect(self.load_employees)
         self.employee_window.show()
 
-    # Load Employees into Dropdown
-    def load_employees(self):
-        self.employee_select.clear()
-        self.employee_select.addItem("Slobodno")
-        
-        conn = sqlite3.connect("employees.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT first_name, last_name, company FROM employees")
-        employees = cursor.fetchall()
-        conn.close()
-        
-        for emp in employees:
-            self.employee_select.addItem(f"{emp[0]} {emp[1]} ({emp[2]})")
-
     def add_equipment(self):
         name = self.name_input.text().strip()
         category = self.category_input.currentText()
-        assigned_to = self.employee_select.currentText()
+        employee_id = self.employee_select.currentData()
 
         if not name or not category:
             QMessageBox.warning(self, "Greška", "Naziv i kategorija su obavezni!")
             return
+        if employee_id is None and self.employee_select.text().strip():
+            QMessageBox.warning(self, "Greška", "Odaberite djelatnika s popisa ili ostavite polje prazno!")
+            return
 
-        equipment_id = generate_unique_id("inventory.db", "equipment")
-        conn = sqlite3.connect("inventory.db")
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO equipment (id, name, category, assigned_to) VALUES (?, ?, ?, ?)", 
-                    (equipment_id, name, category, assigned_to if assigned_to != "Slobodno" else "Slobodno"))
-        conn.commit()
-        conn.close()
+        # The new row is appended to the table if it matches the current search
+        row = self.cache.add_equipment(name, category, employee_id)
 
-        # Generate QR Code
-        generate_qr_code(equipment_id, f"qr_codes/equipment_{equipment_id}.png")
+        # Generate QR Code in the background
+        QThreadPool.globalInstance().start(LabelWorker(regenerate_labels, [row[0]]))
 
-        self.load_equipment()  # Refresh Table
         self.name_input.clear()
 
     # Load Equipment into Table
@@ -360,105 +877,79 @@ class ITInventory(QWidget):
         search_text = self.search_input.text().strip()
         filter_category = self.filter_category.currentText()
 
-        conn = sqlite3.connect("inventory.db")
-        cursor = conn.cursor()
-
-        query = "SELECT id, name, category, assigned_to, last_audit FROM equipment WHERE 1=1"
-        params = []
-
-        if search_text:
-            query += " AND name LIKE ?"
-            params.append(f"%{search_text}%")
-
-        if filter_category != "Sve kategorije":
-            query += " AND category = ?"
-            params.append(filter_category)
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-
-        self.table.setRowCount(len(rows))
-        for row_idx, row in enumerate(rows):
-            self.table.setRowHeight(row_idx, 50)
-            self.table.setItem(row_idx, 0, QTableWidgetItem(str(row[0])))  # ID
-            self.table.setItem(row_idx, 1, QTableWidgetItem(row[1]))  # Naziv
-            self.table.setItem(row_idx, 2, QTableWidgetItem(row[2]))  # Kategorija
-            self.table.setItem(row_idx, 3, QTableWidgetItem(row[3]))  # Dodijeljeno
-            self.table.setItem(row_idx, 4, QTableWidgetItem(row[4] if row[4] else "Nije skenirano")) # Posljednji audit
-
-            # Stupac "Akcije" (Dodijeli ili Odvojiti)
-            action_layout = QHBoxLayout()
-            action_widget = QWidget()
-
-            if row[3] == "Slobodno":
-                assign_button = QPushButton("Dodijeli")
-                assign_button.setStyleSheet("min-height: 20px")
-                assign_button.clicked.connect(lambda _, id=row[0]: self.open_assign_employee_window(id))
-                action_layout.addWidget(assign_button)
-            else:
-                unassign_button = QPushButton("Odvojiti")
-                unassign_button.setStyleSheet("background-color: orange; color: black; min-height: 20px;")
-                unassign_button.clicked.connect(lambda _, id=row[0]: self.unassign_equipment(id))
-                action_layout.addWidget(unassign_button)
-
-            action_widget.setLayout(action_layout)
-            self.table.setCellWidget(row_idx, 4, action_widget)  # Stupac "Akcije"
-
-            # Stupac "Obriši"
-            delete_button = QPushButton("🗑️ Obriši")
-            delete_button.setStyleSheet("background-color: red; color: white; min-height: 20px;")
-            delete_button.clicked.connect(lambda _, id=row[0]: self.delete_equipment(id))
-
-            delete_widget = QWidget()
-            delete_layout = QHBoxLayout()
-            delete_layout.addWidget(delete_button)
-            delete_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            delete_widget.setLayout(delete_layout)
-
-            self.table.setCellWidget(row_idx, 5, delete_widget)  # Stupac "Obriši"
-
+        self.search_pipeline.search(search_text, filter_category)
+
+    def update_search_stats(self, latency):
+        stats = self.search_pipeline.stats()
+        self.search_stats_label.setText(
+            f"{latency * 1000:.0f} ms (p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms)")
+
+    # Stupac "Akcije" (Dodijeli ili Odvojiti)
+    def action_button_for_row(self, row):
+        if row[5] is None:
+            return "Dodijeli", None, None
+        return "Odvojiti", "orange", "black"
+
+    def on_action_clicked(self, row):
+        if row[5] is None:
+            self.open_assign_employee_window([row[0]])
+        else:
+            self.unassign_equipment([row[0]])
+
+    # Bulk Actions
+    def selected_ids(self):
+        rows = self.table.selectionModel().selectedRows()
+        return sorted(self.model.data(index, Qt.ItemDataRole.UserRole)[0] for index in rows)
+
+    def update_selection(self):
+        count = len(self.table.selectionModel().selectedRows())
+        self.selection_label.setText(f"Odabrano: {count}")
+        for button in self.bulk_buttons:
+            button.setEnabled(count > 0)
+
+    def change_category(self):
+        equipment_ids = self.selected_ids()
+        if equipment_ids:
+            self.cache.set_category(equipment_ids, self.bulk_category.currentText())
+
+    def delete_equipment(self, equipment_ids):
+        if not equipment_ids:
+            return
 
-    def delete_equipment(self, equipment_id):
-        reply = QMessageBox.question(self, "Potvrda", "Jeste li sigurni da želite obrisati ovu opremu?",
+        if len(equipment_ids) == 1:
+            question = "Jeste li sigurni da želite obrisati ovu opremu?"
+        else:
+            question = f"Jeste li sigurni da želite obrisati {len(equipment_ids)} komada opreme?"
+        reply = QMessageBox.question(self, "Potvrda", question,
                                  QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, 
                                  QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            conn = sqlite3.connect("inventory.db")
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM equipment WHERE id = ?", (equipment_id,))
-            conn.commit()
-            conn.close()
+            self.cache.delete_equipment(equipment_ids)  # Uklanja samo te retke
 
-            self.load_equipment()  # Osvježi prikaz
-
-
-    def open_assign_employee_window(self, equipment_id):
-        self.assign_window = AssignEmployeeWindow(self, equipment_id)
+    def open_assign_employee_window(self, equipment_ids):
+        if not equipment_ids:
+            return
+        self.assign_window = AssignEmployeeWindow(self, equipment_ids)
         self.assign_window.show()
 
-    def unassign_equipment(self, equipment_id):
-        conn = sqlite3.connect("inventory.db")
-        cursor = conn.cursor()
-        cursor.execute("UPDATE equipment SET assigned_to = 'Slobodno' WHERE id = ?", (equipment_id,))
-        conn.commit()
-        conn.close()
-
-        self.load_equipment()  # Osvježi tablicu
+    def unassign_equipment(self, equipment_ids):
+        self.cache.set_assignment(equipment_ids, None)  # Osvježi samo te retke
 
 class AssignEmployeeWindow(QWidget):
-    def __init__(self, parent, equipment_id):
+    def __init__(self, parent, equipment_ids):
         super().__init__()
         self.parent = parent
-        self.equipment_id = equipment_id
-        self.setWindowTitle("Dodijeli djelatnika")
+        self.equipment_ids = equipment_ids
+        if len(equipment_ids) == 1:
+            self.setWindowTitle("Dodijeli djelatnika")
+        else:
+            self.setWindowTitle(f"Dodijeli djelatnika ({len(equipment_ids)} komada opreme)")
         self.setGeometry(400, 200, 300, 150)
 
         layout = QVBoxLayout()
 
-        # Dropdown za odabir djelatnika
-        self.employee_select = QComboBox()
-        self.load_employees()
+        # Odabir djelatnika upisom imena, prezimena ili tvrtke
+        self.employee_select = EmployeePicker(parent.cache, parent=self)
         layout.addWidget(self.employee_select)
 
         # Gumb za potvrdu dodjele
@@ -468,36 +959,19 @@ class AssignEmployeeWindow(QWidget):
 
         self.setLayout(layout)
 
-    def load_employees(self):
-        conn = sqlite3.connect("employees.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT first_name, last_name, company FROM employees")
-        employees = cursor.fetchall()
-        conn.close()
-
-        self.employee_select.clear()
-        for emp in employees:
-            self.employee_select.addItem(f"{emp[0]} {emp[1]} ({emp[2]})")
-
     def assign_employee(self):
-        selected_employee = self.employee_select.currentText()
-        if not selected_employee:
+        employee_id = self.employee_select.currentData()
+        if employee_id is None:
             QMessageBox.warning(self, "Greška", "Odaberite djelatnika!")
             return
 
-        conn = sqlite3.connect("inventory.db")
-        cursor = conn.cursor()
-        cursor.execute("UPDATE equipment SET assigned_to = ? WHERE id = ?", (selected_employee, self.equipment_id))
-        conn.commit()
-        conn.close()
-
-        self.parent.load_equipment()  # Ažuriraj tablicu
+        self.parent.cache.set_assignment(self.equipment_ids, employee_id)  # Ažuriraj samo te retke
         self.close()
 
 
 # Run App
 if __name__ == "__main__":
-    setup_databases()
+    db.setup_databases()
     app = QApplication(sys.argv)
     window = ITInventory()
     window.show()
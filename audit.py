@@ -0,0 +1,432 @@
+""" Upis audita opreme, jedan ili više skenova odjednom
+
+Skener može skenove čuvati dok je izvan mreže i poslati ih kasnije; svaki sken nosi
+vrijeme kad je stvarno napravljen (scanned_at), a ne vrijeme kad je stigao na server.
+"""
+import calendar
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import db
+
+logger = logging.getLogger("inventory.audit")
+
+MAX_BATCH = 1000
+
+# Same format as SQLite datetime('now'), so old and new values sort together
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def to_epoch(timestamp):
+    """ Tekst u formatu last_audit u Unix vrijeme (sekunde, UTC) za audit_log """
+    return calendar.timegm(time.strptime(timestamp, TIMESTAMP_FORMAT))
+
+def parse_scanned_at(value, now):
+    """ ISO 8601 vrijeme skena u UTC tekst za last_audit; bez vremena znači sada
+
+    Vrijeme bez zone se tretira kao UTC. Vrijeme u budućnosti (krivi sat na
+    uređaju) se svodi na sada, da jedan sken ne bi zauvijek ostao "najnoviji".
+    """
+    if value in (None, ""):
+        return now.strftime(TIMESTAMP_FORMAT)
+    if not isinstance(value, str):
+        raise ValueError
+
+    scanned_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if scanned_at.tzinfo is None:
+        scanned_at = scanned_at.replace(tzinfo=timezone.utc)
+    scanned_at = min(scanned_at.astimezone(timezone.utc), now)
+    return scanned_at.strftime(TIMESTAMP_FORMAT)
+
+def _equipment_id(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, str):
+        value = value.strip()
+    number = int(value)
+    if number <= 0:
+        raise ValueError
+    return number
+
+def validate_scan(scan, now):
+    """ (equipment_id, scanned_at) iz jednog skena ili rezultat s greškom za klijenta """
+    raw_id = scan.get("equipment_id") if isinstance(scan, dict) else None
+    try:
+        equipment_id = _equipment_id(raw_id)
+    except (TypeError, ValueError):
+        return None, {"equipment_id": raw_id, "status": "invalid", "message": "Neispravan equipment_id"}
+    try:
+        scanned_at = parse_scanned_at(scan.get("scanned_at"), now)
+    except ValueError:
+        return None, {"equipment_id": equipment_id, "status": "invalid", "message": "Neispravan scanned_at"}
+    return (equipment_id, scanned_at), None
+
+def apply_audits(conn, scans):
+    """ Upisuje skenove [{equipment_id, scanned_at}] i vraća rezultat za svaki sken, istim redom
+
+    Status je "updated", "stale" (oprema već ima noviji audit), "not_found" ili
+    "invalid". Poziva se unutar transakcije; svi skenovi se upisuju zajedno, a
+    svaki pronađeni sken (i zakašnjeli) ide i u povijest audit_log.
+    """
+    now = datetime.now(timezone.utc)
+    results = []
+    latest = {}
+
+    for scan in scans:
+        valid, error = validate_scan(scan, now)
+        if error:
+            results.append(error)
+            continue
+
+        equipment_id, scanned_at = valid
+        results.append({"equipment_id": equipment_id, "scanned_at": scanned_at})
+        latest[equipment_id] = max(scanned_at, latest.get(equipment_id, scanned_at))
+
+    ids = list(latest)
+    current = {}
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        current.update(conn.execute(f"SELECT id, last_audit FROM equipment WHERE id IN ({placeholders})", chunk))
+
+    # An offline scan uploaded late must not move last_audit back in time
+    updates = [
+        (scanned_at, equipment_id) for equipment_id, scanned_at in latest.items()
+        if equipment_id in current and (current[equipment_id] is None or current[equipment_id] < scanned_at)
+    ]
+    conn.executemany("UPDATE equipment SET last_audit = ? WHERE id = ?", updates)
+
+    # A replayed journal brings the same scan twice, the unique index keeps one
+    conn.executemany("INSERT OR IGNORE INTO audit_log (equipment_id, ts) VALUES (?, ?)", [
+        (result["equipment_id"], to_epoch(result["scanned_at"]))
+        for result in results if "status" not in result and result["equipment_id"] in current
+    ])
+
+    for result in results:
+        if "status" in result:
+            continue
+        equipment_id = result["equipment_id"]
+        if equipment_id not in current:
+            result["status"] = "not_found"
+        elif result["scanned_at"] == latest[equipment_id] and (current[equipment_id] or "") < latest[equipment_id]:
+            result["status"] = "updated"
+        else:
+            result["status"] = "stale"
+
+    return results
+
+# Queued ingestion: scans are checked against known ids in memory, acknowledged at
+# once and written by a single thread that commits many of them together
+QUEUE_SIZE = 50000
+COMMIT_INTERVAL_MS = 50
+COMMIT_BATCH = 2000
+ENQUEUE_TIMEOUT = 0.5
+JOURNAL_DIR = "audit_journal"
+JOURNAL_MODES = ("none", "flush", "fsync")
+LATENCY_WINDOW = 500
+# A batch waits this many seconds for a database locked by another writer, then is set aside
+LOCKED_RETRIES = 30
+
+class QueueFull(Exception):
+    pass
+
+def is_locked(error):
+    """ SQLITE_BUSY ili SQLITE_LOCKED: drugi pisač drži bazu, ponovni pokušaj ima smisla """
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+class KnownIds:
+    """ Id-evi opreme kao bitmapa (1 bit po id-u), osvježava se kad se oprema doda ili obriše
+
+    Brojač je db.EQUIPMENT_IDS_VERSION, pa ga upisi last_audit ne mijenjaju i sken
+    nepoznatog id-a nakon audita ne čita ponovno sve id-eve.
+    """
+    def __init__(self):
+        self._bits = bytearray()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        # One reload at a time; threads that waited find the version already current
+        with self._lock:
+            with db.connection() as conn:
+                version = db.table_versions(conn).get(db.EQUIPMENT_IDS_VERSION)
+                if version == self._version:
+                    return
+                bits = bytearray()
+                for (equipment_id,) in conn.execute("SELECT id FROM equipment"):
+                    index = equipment_id >> 3
+                    if index >= len(bits):
+                        bits.extend(bytes(index - len(bits) + 1 + len(bits) // 2))
+                    bits[index] |= 1 << (equipment_id & 7)
+            self._bits, self._version = bits, version
+
+    def _contains(self, equipment_id):
+        index = equipment_id >> 3
+        return index < len(self._bits) and bool(self._bits[index] & (1 << (equipment_id & 7)))
+
+    def __contains__(self, equipment_id):
+        if self._contains(equipment_id):
+            return True
+        # Possibly added after the last refresh; deleted ids may stay set, updating them is a no-op
+        self.refresh()
+        return self._contains(equipment_id)
+
+class AuditQueue:
+    """ Red skenova s jednim pisačem koji upisuje grupno, svakih interval_ms ili batch skenova
+
+    Sken se prije potvrde zapisuje u journal (osim u načinu "none"), pa ga pisač
+    nakon pada procesa može ponovno upisati: replay_journals() pri pokretanju.
+    "flush" preživi pad procesa, "fsync" i nestanak struje.
+    """
+    def __init__(self, journal_mode="flush", journal_dir=JOURNAL_DIR, maxsize=QUEUE_SIZE,
+                 interval_ms=COMMIT_INTERVAL_MS, batch=COMMIT_BATCH):
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"journal_mode mora biti jedan od: {', '.join(JOURNAL_MODES)}")
+
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.interval = interval_ms / 1000
+        self.batch = batch
+        self.known_ids = KnownIds()
+        self.known_ids.refresh()
+
+        self.journal_mode = journal_mode
+        self._journal = None
+        if journal_mode != "none":
+            os.makedirs(journal_dir, exist_ok=True)
+            self._journal = open(os.path.join(journal_dir, f"audit-{os.getpid()}.jsonl"), "a", encoding="utf-8")
+        self._journal_lock = threading.Lock()
+
+        self.commit_latencies = deque(maxlen=LATENCY_WINDOW)
+        # Changed by request threads and by the writer
+        self._counters_lock = threading.Lock()
+        self.counters = {"accepted": 0, "rejected": 0, "committed": 0, "commits": 0, "failed_commits": 0,
+                         "set_aside": 0}
+        self._stopping = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._writer.start()
+
+    def submit(self, scans):
+        """ Provjerava i stavlja skenove u red; vraća rezultat po skenu ("accepted", "not_found", "invalid")
+
+        Ako red ostane pun dulje od ENQUEUE_TIMEOUT, baca QueueFull i ništa od
+        zahtjeva nije prihvaćeno, pa ga klijent može ponoviti u cijelosti.
+        """
+        now = datetime.now(timezone.utc)
+        results, accepted = [], []
+        for scan in scans:
+            valid, error = validate_scan(scan, now)
+            if error:
+                results.append(error)
+            elif valid[0] not in self.known_ids:
+                results.append({"equipment_id": valid[0], "scanned_at": valid[1], "status": "not_found"})
+            else:
+                results.append({"equipment_id": valid[0], "scanned_at": valid[1], "status": "accepted"})
+                accepted.append(valid)
+
+        if accepted:
+            self._enqueue(accepted)
+        return results
+
+    def _enqueue(self, items):
+        deadline = time.monotonic() + ENQUEUE_TIMEOUT
+        while True:
+            # Queue and journal change together under the lock, see _truncate_journal
+            with self._journal_lock:
+                if self.queue.maxsize - self.queue.qsize() >= len(items):
+                    for item in items:
+                        self.queue.put_nowait(item)
+                    self._write_journal(items)
+                    self._count("accepted", len(items))
+                    return
+            if time.monotonic() >= deadline:
+                self._count("rejected", len(items))
+                raise QueueFull
+            time.sleep(0.005)
+
+    def _write_journal(self, items):
+        if self._journal is None:
+            return
+        self._journal.write("".join(json.dumps(item) + "\n" for item in items))
+        self._journal.flush()
+        if self.journal_mode == "fsync":
+            os.fsync(self._journal.fileno())
+
+    def _truncate_journal(self):
+        # Everything journaled so far is committed once the queue is empty
+        with self._journal_lock:
+            if self._journal is not None and self.queue.empty():
+                self._journal.seek(0)
+                self._journal.truncate()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            try:
+                items = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            # The writer must outlive any error, a dead writer turns every request into a 503
+            try:
+                self._collect_and_commit(items)
+            except Exception:
+                logger.exception("audit writer error")
+
+    def _collect_and_commit(self, items):
+        # Group commit: wait up to the interval for more scans, or until the batch is full
+        deadline = time.monotonic() + self.interval
+        while len(items) < self.batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        self._commit(items)
+
+    def _count(self, name, value=1):
+        with self._counters_lock:
+            self.counters[name] += value
+
+    def _write(self, items, retries=None):
+        retries = LOCKED_RETRIES if retries is None else retries
+        scans = [{"equipment_id": equipment_id, "scanned_at": scanned_at} for equipment_id, scanned_at in items]
+        for attempt in range(retries + 1):
+            try:
+                with db.transaction() as conn:
+                    apply_audits(conn, scans)
+                return
+            except sqlite3.OperationalError as e:
+                # Only a database locked for longer than busy_timeout is worth waiting for; the scans stay in the journal
+                if not is_locked(e) or attempt == retries:
+                    raise
+                logger.warning("audit commit found the database locked, retrying", extra={"attempt": attempt + 1})
+                self._count("failed_commits")
+                time.sleep(1)
+
+    def _commit(self, items):
+        start = time.perf_counter()
+        set_aside = []
+        try:
+            self._write(items)
+        except Exception as e:
+            self._count("failed_commits")
+            if isinstance(e, sqlite3.OperationalError) and is_locked(e):
+                # Still locked after all retries: the batch waits for the next start instead of blocking the queue
+                logger.exception("audit commit gave up on a locked database")
+                set_aside = items
+            else:
+                # Any other error: the scans go one by one, so one bad scan does not take the batch with it
+                logger.exception("audit commit failed, writing scans one by one")
+                set_aside = self._write_one_by_one(items)
+
+        if set_aside:
+            self._set_aside(set_aside)
+        self.commit_latencies.append(time.perf_counter() - start)
+        with self._counters_lock:
+            self.counters["commits"] += 1
+            self.counters["committed"] += len(items) - len(set_aside)
+        self._truncate_journal()
+
+    def _write_one_by_one(self, items):
+        """ Upisuje skenove pojedinačno i vraća one koji ni tako nisu upisani """
+        failed = []
+        for item in items:
+            try:
+                self._write([item], retries=0)
+            except Exception:
+                logger.exception("audit scan not written", extra={"equipment_id": item[0]})
+                failed.append(item)
+        return failed
+
+    def _set_aside(self, items):
+        # Kept next to the journals, so replay_journals() tries them again at the next start
+        self._count("set_aside", len(items))
+        if self._journal is None:
+            return
+        path = os.path.join(os.path.dirname(self._journal.name), f"audit-failed-{os.getpid()}.jsonl")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(item) + "\n" for item in items))
+
+    def stop(self, timeout=10):
+        """ Upisuje sve što je u redu i zaustavlja pisača
+
+        Journal se briše samo ako je pisač stvarno završio; inače ima skenove koje je
+        uzeo iz reda, a nije upisao, pa journal ostaje za replay_journals().
+        """
+        self._stopping.set()
+        self._writer.join(timeout)
+        if self._writer.is_alive():
+            logger.warning("audit writer still running, journal kept for replay",
+                           extra={"queued": self.queue.qsize()})
+        else:
+            self._truncate_journal()
+        with self._journal_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def metrics(self):
+        latencies = sorted(self.commit_latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+        with self._counters_lock:
+            counters = dict(self.counters)
+        commits = counters["commits"]
+        return dict(
+            counters,
+            queue_depth=self.queue.qsize(),
+            queue_capacity=self.queue.maxsize,
+            avg_batch=counters["committed"] / commits if commits else 0.0,
+            commit_p50_ms=percentile(0.50),
+            commit_p95_ms=percentile(0.95),
+            journal=self.journal_mode,
+        )
+
+def replay_journals(journal_dir=JOURNAL_DIR):
+    """ Upisuje skenove iz journala procesa koji su stali prije upisa i briše journale
+
+    Poziva se pri pokretanju servera, prije nego što radni procesi otvore svoje
+    journale. Ponovni upis već upisanog skena ne mijenja ništa, last_audit ide samo naprijed.
+    """
+    if not os.path.isdir(journal_dir):
+        return 0
+
+    replayed = 0
+    for name in sorted(os.listdir(journal_dir)):
+        if not name.endswith(".jsonl"):
+            continue
+        path = os.path.join(journal_dir, name)
+        scans = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    equipment_id, scanned_at = json.loads(line)
+                except ValueError:
+                    break  # torn last line from a crash in the middle of a write
+                scans.append({"equipment_id": equipment_id, "scanned_at": scanned_at})
+
+        try:
+            for i in range(0, len(scans), COMMIT_BATCH):
+                with db.transaction() as conn:
+                    apply_audits(conn, scans[i:i + COMMIT_BATCH])
+        except Exception:
+            # Kept for the next start; the server still starts
+            logger.exception("journal replay failed", extra={"journal": name})
+            continue
+        replayed += len(scans)
+        os.remove(path)
+
+    return replayed
@@ -0,0 +1,89 @@
+""" Usporedba: nova konekcija po zahtjevu (staro) i pool konekcija s WAL-om (db.py)
+
+Više dretvi istovremeno radi isto što i /audit (SELECT, UPDATE, commit) nad
+privremenom bazom, a rezultat je broj zahtjeva u sekundi i broj grešaka
+"database is locked".
+
+    python benchmarks/bench_connections.py --threads 8 --requests 500
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+
+def create_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE equipment (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            assigned_to TEXT DEFAULT 'Slobodno',
+            last_audit TEXT
+        )
+    ''')
+    conn.executemany("INSERT INTO equipment (id, name, category) VALUES (?, ?, 'Monitor')",
+                     ((i, f"Monitor {i}") for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+def audit_fresh_connection(path, equipment_id):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM equipment WHERE id = ?", (equipment_id,))
+    if cursor.fetchone():
+        cursor.execute("UPDATE equipment SET last_audit = datetime('now') WHERE id = ?", (equipment_id,))
+        conn.commit()
+    conn.close()
+
+def audit_pooled(path, equipment_id):
+    with db.transaction(path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM equipment WHERE id = ?", (equipment_id,))
+        if cursor.fetchone():
+            cursor.execute("UPDATE equipment SET last_audit = datetime('now') WHERE id = ?", (equipment_id,))
+
+def run(audit, path, threads, requests, rows):
+    errors = []
+
+    def worker():
+        for _ in range(requests):
+            try:
+                audit(path, random.randrange(rows))
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return threads * requests / elapsed, len(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="zahtjeva po dretvi")
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, audit in (("connect per request", audit_fresh_connection), ("pooled + WAL", audit_pooled)):
+            path = os.path.join(tmp, label.replace(" ", "_") + ".db")
+            create_database(path, args.rows)
+            per_second, errors = run(audit, path, args.threads, args.requests, args.rows)
+            print(f"{label:<22} {per_second:10.0f} req/s   locked errors: {errors}")
+        db.close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+""" Sintetički inventar za mjerenja: 10k / 100k / 1M komada opreme s istim sjemenom uvijek isti
+
+Raspodjele su nalik stvarnima: monitora i kućišta ima više od laptopa, nekoliko
+modela čini većinu opreme, većina djelatnika radi u nekoliko velikih tvrtki, a
+oko četvrtine opreme je slobodno. Svaki komad ima 0-6 skenova u zadnjih godinu
+dana (audit_log), a last_audit je zadnji od njih.
+
+    python benchmarks/generate_data.py 100k bench_100k.db
+    python benchmarks/generate_data.py 250000 velika.db --seed 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db
+import fts
+from audit import TIMESTAMP_FORMAT
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+SEED = 2024
+EQUIPMENT_PER_EMPLOYEE = 8
+ASSIGNED_SHARE = 0.75
+NEVER_AUDITED_SHARE = 0.12
+MAX_SCANS = 6
+YEAR = 365 * 86400
+# Scan times count back from a fixed moment, so a seed always gives the same database
+NOW = 1_760_000_000
+BATCH = 50_000
+
+# (category, weight, [(model, weight), ...])
+CATALOG = [
+    ("Monitor", 30, [("Dell P2422H", 35), ("Dell U2723QE", 10), ("LG 27UL500", 15), ("Samsung S24R350", 20),
+                     ("HP E24 G5", 15), ("Philips 243V7QDAB", 5)]),
+    ("Kučište", 20, [("Dell OptiPlex 7090", 40), ("HP ProDesk 400 G7", 30), ("Lenovo ThinkCentre M70q", 25),
+                     ("Fujitsu Esprimo P558", 5)]),
+    ("Miš", 18, [("Logitech M185", 45), ("Logitech MX Master 3", 10), ("Dell MS116", 35), ("Microsoft Basic Optical", 10)]),
+    ("Tipkovnica", 18, [("Logitech K120", 50), ("Dell KB216", 35), ("Microsoft Wired 600", 10), ("Logitech MX Keys", 5)]),
+    ("Laptop", 14, [("Lenovo ThinkPad T14", 35), ("Dell Latitude 5430", 30), ("HP EliteBook 840 G8", 25),
+                    ("Apple MacBook Air M2", 10)]),
+]
+
+FIRST_NAMES = ["Ivan", "Marko", "Luka", "Josip", "Ante", "Tomislav", "Petar", "Nikola", "Filip", "Matej", "Stjepan",
+               "Ana", "Marija", "Ivana", "Petra", "Kristina", "Lucija", "Martina", "Maja", "Katarina", "Nikolina",
+               "Sara", "Mia", "Ema", "Lana", "Dora", "Karlo", "Domagoj", "Hrvoje", "Goran"]
+LAST_NAMES = ["Horvat", "Kovačević", "Babić", "Marić", "Jurić", "Novak", "Kovačić", "Knežević", "Vuković",
+              "Marković", "Petrović", "Matić", "Tomić", "Pavlović", "Kovač", "Božić", "Blažević", "Grgić",
+              "Pavić", "Radić", "Perić", "Filipović", "Šarić", "Lovrić", "Vidović", "Perković", "Popović",
+              "Bošnjak", "Jukić", "Barišić", "Mikulić", "Nikolić", "Vrdoljak", "Pranjić", "Šimić"]
+COMPANIES = ["Jadran Logistika d.o.o.", "Panonija Energija d.d.", "Kvarner Software d.o.o.", "Dalmacija Turist d.d.",
+             "Slavonija Agro d.o.o.", "Zagorje Gradnja d.o.o.", "Istra Pharma d.d.", "Lika Drvo d.o.o.",
+             "Velebit Telekom d.d.", "Sava Osiguranje d.d.", "Drava Metal d.o.o.", "Neretva Trade d.o.o."]
+
+def _weighted(rng, pairs, count):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights, k=count)
+
+def employee_rows(rng, count):
+    # Big companies employ most people: weight 1/rank
+    companies = _weighted(rng, [(company, 1 / rank) for rank, company in enumerate(COMPANIES, start=1)], count)
+    for company in companies:
+        yield rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), company
+
+def equipment_rows(rng, count, employees):
+    categories = _weighted(rng, [(name, weight) for name, weight, _ in CATALOG], count)
+    models = {name: models for name, _, models in CATALOG}
+    for category in categories:
+        model = _weighted(rng, models[category], 1)[0]
+        # Some people (IT, team leads) hold far more equipment than others
+        employee_id = int(employees * rng.random() ** 2) + 1 if rng.random() < ASSIGNED_SHARE else None
+        yield model, category, employee_id
+
+def scan_times(rng, now):
+    """ Skenovi jednog komada opreme, najnoviji zadnji; prazno za nikad skeniranu opremu """
+    if rng.random() < NEVER_AUDITED_SHARE:
+        return []
+    return sorted({now - int(YEAR * rng.random()) for _ in range(rng.randint(1, MAX_SCANS))})
+
+def generate(path, items, seed=SEED, now=None):
+    """ Stvara novu bazu s `items` komada opreme; postojeća datoteka se briše """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    rng = random.Random(seed)
+    now = now if now is not None else NOW
+    employees = max(1, items // EQUIPMENT_PER_EMPLOYEE)
+
+    db.setup_databases(path)
+    with db.transaction(path) as conn:
+        conn.executemany("INSERT INTO employees (first_name, last_name, company) VALUES (?, ?, ?)",
+                         employee_rows(rng, employees))
+
+        # A new database hands out ids 1..items in insert order
+        with fts.bulk_insert(conn) as pending:
+            for start in range(1, items + 1, BATCH):
+                rows, scans = [], []
+                count = min(BATCH, items + 1 - start)
+                for equipment_id, row in enumerate(equipment_rows(rng, count, employees), start=start):
+                    times = scan_times(rng, now)
+                    scans += [(equipment_id, ts) for ts in times]
+                    last_audit = time.strftime(TIMESTAMP_FORMAT, time.gmtime(times[-1])) if times else None
+                    rows.append(row + (last_audit,))
+
+                conn.executemany("INSERT INTO equipment (name, category, assigned_employee_id, last_audit) "
+                                 "VALUES (?, ?, ?, ?)", rows)
+                conn.executemany("INSERT INTO audit_log (equipment_id, ts) VALUES (?, ?)", scans)
+            pending.extend(range(1, items + 1))
+
+    db.get_pool(path).close()
+    return {"items": items, "employees": employees, "seed": seed}
+
+def parse_size(value):
+    return SIZES[value.lower()] if value.lower() in SIZES else int(value)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("size", type=parse_size, help=f"{', '.join(SIZES)} ili broj komada")
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = generate(args.path, args.size, args.seed)
+    print(f"{summary['items']} komada opreme i {summary['employees']} djelatnika u '{args.path}' "
+          f"za {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+""" Opterećenje /audit: server u produkcijskom načinu s N procesa nad privremenom bazom
+
+Pokreće server.py (gunicorn, TLS) nad novom bazom s `--rows` komada opreme, zatim
+`--clients` dretvi šalje zahtjeve preko keep-alive HTTPS konekcija dok ne istekne
+`--duration` sekundi. Ispisuje zahtjeve u sekundi, latencije i greške.
+
+    python benchmarks/load_audit.py --workers 1 2 4 --clients 16
+    python benchmarks/load_audit.py --workers 4 --batch 100    # /audit/batch po 100 skenova
+    python benchmarks/load_audit.py --audit-mode queued        # grupni upis iz reda
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from generate_data import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server se nije pokrenuo na portu {port}")
+
+def start_server(db_path, port, workers, threads, audit_mode):
+    env = dict(os.environ, INVENTORY_DB=db_path, INVENTORY_LOG_LEVEL="WARNING")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py"), "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--threads", str(threads), "--audit-mode", audit_mode,
+         "--cert", os.path.join(ROOT, "localhost.pem"), "--key", os.path.join(ROOT, "localhost-key.pem")],
+        # The audit journal directory is created in the working directory
+        cwd=os.path.dirname(db_path), env=env,
+    )
+    wait_for_port(port)
+    return server
+
+def client(port, rows, batch, deadline, results):
+    context = ssl._create_unverified_context()
+    conn = http.client.HTTPSConnection("127.0.0.1", port, context=context)
+    headers = {"Content-Type": "application/json"}
+    latencies, errors = [], 0
+
+    while time.monotonic() < deadline:
+        if batch:
+            path = "/audit/batch"
+            body = {"scans": [{"equipment_id": random.randint(1, rows)} for _ in range(batch)]}
+        else:
+            path = "/audit"
+            body = {"equipment_id": random.randint(1, rows)}
+
+        start = time.perf_counter()
+        try:
+            conn.request("POST", path, json.dumps(body), headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status not in (200, 202):
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPSConnection("127.0.0.1", port, context=context)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+    conn.close()
+    results.append((latencies, errors))
+
+def run(db_path, port, workers, threads, clients, rows, batch, duration, audit_mode):
+    server = start_server(db_path, port, workers, threads, audit_mode)
+    try:
+        results = []
+        deadline = time.monotonic() + duration
+        threads_ = [threading.Thread(target=client, args=(port, rows, batch, deadline, results)) for _ in range(clients)]
+        for thread in threads_:
+            thread.start()
+        for thread in threads_:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    if not latencies:
+        return {"workers": workers, "requests": 0, "errors": errors}
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "req_per_s": len(latencies) / duration,
+        "scans_per_s": len(latencies) * (batch or 1) / duration,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4, help="dretvi po procesu servera")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=0, help="skenova po zahtjevu na /audit/batch, 0 = /audit")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--audit-mode", choices=("sync", "queued"), default="sync")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    print(f"{'procesa':>8} {'zahtjeva':>9} {'req/s':>9} {'skenova/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'greške':>7}")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, "inventory.db")
+            generate(db_path, args.rows)
+            r = run(db_path, args.port, workers, args.threads, args.clients, args.rows, args.batch, args.duration, args.audit_mode)
+
+        if not r["requests"]:
+            print(f"{workers:>8} {'-':>9} {'-':>9} {'-':>10} {'-':>8} {'-':>8} {'-':>8} {r['errors']:>7}")
+            continue
+        print(f"{workers:>8} {r['requests']:>9} {r['req_per_s']:>9.0f} {r['scans_per_s']:>10.0f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}")
+
+if __name__ == "__main__":
+    main()
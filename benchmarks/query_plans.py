@@ -0,0 +1,143 @@
+""" Provjera planova upita: nijedan često korišteni upit ne smije čitati cijelu tablicu
+
+Nad sintetičkom bazom (zadano 1M komada opreme) za svaki upit iz aplikacije i
+servera pokreće EXPLAIN QUERY PLAN. Upit pada ako plan sadrži SCAN tablice ili
+privremeno sortiranje (USE TEMP B-TREE), ili ako ne koristi očekivani indeks.
+Upiti kojima je posao proći kroz sve retke (izvoz, analitika) smiju SCAN, ali i
+dalje moraju koristiti svoj indeks. Izlazni kod je 1 ako je ijedan upit pao.
+
+    python benchmarks/query_plans.py                  # baza se stvori jednom i zatim ponovno koristi
+    python benchmarks/query_plans.py --rows 100000 --rebuild
+    python benchmarks/query_plans.py --db kopija_produkcije.db
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def hot_queries(server):
+    """ (naziv, (upit, parametri), indeks koji plan mora sadržavati, smije li čitati sve retke) """
+    import analytics
+    from exporter import count_query
+    from fts import equipment_page_query, search_query
+    from generate_data import COMPANIES
+
+    def filters(query_string):
+        with server.app.test_request_context(f"/equipment?{query_string}"):
+            return server.equipment_filters()
+
+    ids = list(range(1000, 1500))
+    placeholders = ", ".join("?" * len(ids))
+
+    return [
+        # Desktop table and /equipment, one page at a time
+        ("oprema, stranica", equipment_page_query("", None, 500000, 100), "INTEGER PRIMARY KEY", False),
+        ("oprema, kategorija", equipment_page_query("", "Miš", 500000, 100), "idx_equipment_category", False),
+        ("oprema, djelatnik", equipment_page_query("", None, -1, 100, filters("assigned=42")),
+         "idx_equipment_assigned_employee", False),
+        ("oprema, slobodna", equipment_page_query("", None, -1, 100, filters("assigned=false")),
+         "idx_equipment_assigned_employee", False),
+        ("oprema, audit stariji od", equipment_page_query("", None, -1, 100, filters("audit_older_than=90")),
+         "INTEGER PRIMARY KEY", False),
+        ("pretraga", search_query("dell p24", "Monitor", -1, 100), "VIRTUAL TABLE", False),
+        ("pretraga, rangirano", search_query("dell", "Monitor", -1, 100, ranked=True), "VIRTUAL TABLE", False),
+        ("broj za izvoz, kategorija", count_query("", "Laptop"), "COVERING INDEX idx_equipment_category", False),
+        ("broj za izvoz, pretraga", count_query("thinkpad", "Laptop"), "VIRTUAL TABLE", False),
+        ("djelatnici, stranica", server.employees_page_query(None, 100, 100), "INTEGER PRIMARY KEY", False),
+        ("djelatnici, tvrtka", server.employees_page_query(COMPANIES[6], -1, 100), "idx_employees_company", False),
+
+        # Written at their call site
+        ("retci po id-u (cache)", (f"SELECT id, name, category, assigned_to, last_audit, assigned_employee_id "
+                                   f"FROM equipment_view WHERE id IN ({placeholders}) ORDER BY id", ids),
+         "INTEGER PRIMARY KEY", False),
+        ("naljepnice po id-u", (f"SELECT id, name FROM equipment WHERE id IN ({placeholders}) ORDER BY id", ids),
+         "INTEGER PRIMARY KEY", False),
+        ("audit, postojeći id-evi", (f"SELECT id, last_audit FROM equipment WHERE id IN ({placeholders})", ids),
+         "INTEGER PRIMARY KEY", False),
+        ("audit, upis", ("UPDATE equipment SET last_audit = ? WHERE id = ?", ["2026-01-01 00:00:00", 5]),
+         "INTEGER PRIMARY KEY", False),
+        ("oprema djelatnika", ("SELECT id, name, category FROM equipment WHERE assigned_employee_id = ?", [42]),
+         "idx_equipment_assigned_employee", False),
+        # What ON DELETE SET NULL runs for a deleted employee; without the index every delete reads all equipment
+        ("brisanje djelatnika", ("UPDATE equipment SET assigned_employee_id = NULL WHERE assigned_employee_id = ?", [42]),
+         "idx_equipment_assigned_employee", False),
+        ("izmjene nakon kursora", ("SELECT seq, table_name, row_id, op FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                                   [1000, 1001]), "INTEGER PRIMARY KEY", False),
+        # What the change log triggers run on every write to equipment and employees
+        ("izmjene, zapis retka", ("DELETE FROM change_log WHERE table_name = ? AND row_id = ?", ["equipment", 42]),
+         "idx_change_log_row", False),
+        ("analitika, skenovi po danu", (analytics.SCANS_QUERY, [1_757_000_000, 1_760_000_000]), "COVERING INDEX idx_audit_log_ts", False),
+
+        # Whole table by design
+        ("izvoz, broj svih", count_query(), "COVERING INDEX", True),
+        ("analitika, zadnji sken", (analytics.LAST_SEEN_QUERY, []), "COVERING INDEX idx_audit_log_equipment_ts", True),
+        ("audit, poznati id-evi", ("SELECT id FROM equipment", []), "COVERING INDEX", True),
+        # Walks from the oldest entry and stops at the first one to keep
+        ("izmjene, granica sažimanja", ("SELECT seq FROM change_log WHERE ts >= ? ORDER BY seq LIMIT 1", [1_757_000_000]),
+         "SCAN change_log", True),
+    ]
+
+def plan_problems(plan, expected, full):
+    problems = []
+    for line in plan:
+        if not full and line.startswith("SCAN ") and "VIRTUAL TABLE" not in line:
+            problems.append(line)
+        if not full and "USE TEMP B-TREE" in line:
+            problems.append(line)
+    # A search must start from the FTS index; led by another index it does one MATCH per row
+    if any("VIRTUAL TABLE" in line for line in plan) and "VIRTUAL TABLE" not in plan[0]:
+        problems.append("pretraga ne počinje od FTS indeksa")
+    if expected and not any(expected in line for line in plan):
+        problems.append(f"ne koristi {expected}")
+    return problems
+
+def check(conn, queries):
+    failed = 0
+    for name, (query, params), expected, full in queries:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+        # Only reads are timed, writes would change the database that is reused next run
+        elapsed = ""
+        if query.lstrip().upper().startswith("SELECT"):
+            start = time.perf_counter()
+            conn.execute(query, params).fetchall()
+            elapsed = f"{(time.perf_counter() - start) * 1000:.1f}"
+
+        problems = plan_problems(plan, expected, full)
+        failed += bool(problems)
+        print(f"{'PAO' if problems else 'ok':<4} {name:<28} {elapsed:>9} ms   {' | '.join(plan)}")
+        for problem in problems:
+            print(f"{'':<4} {'':<28} {'':>12}   -> {problem}")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", help="postojeća baza umjesto sintetičke")
+    parser.add_argument("--rebuild", action="store_true", help="ponovno stvori sintetičku bazu")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.gettempdir(), f"inventory_plans_{args.rows}.db")
+
+    # db reads INVENTORY_DB when first imported (by the generator or server), and server
+    # brings the schema and its indexes up to date on import
+    os.environ["INVENTORY_DB"] = path
+    from generate_data import generate
+    if not args.db and (args.rebuild or not os.path.exists(path)):
+        print(f"Stvaram '{path}' s {args.rows} komada opreme...")
+        generate(path, args.rows)
+
+    import db
+    import server
+
+    with db.connection() as conn:
+        failed = check(conn, hot_queries(server))
+
+    print(f"\n{failed} upita s lošim planom" if failed else "\nSvi planovi su u redu")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
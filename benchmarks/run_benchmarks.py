@@ -0,0 +1,263 @@
+""" Mjerenja vrućih putanja aplikacije i servera nad sintetičkim inventarom
+
+Za svaku veličinu se baza generira jednom (generate_data.py, u privremeni direktorij)
+i zatim kopira, pa upisi u mjerenjima ne mijenjaju izvornik. Mjerenja jedne veličine
+rade u zasebnom procesu s INVENTORY_DB na kopiji: tablica u aplikaciji (Qt bez
+prozora), pretraga, dodavanje opreme, izvoz, QR naljepnice i rute servera preko
+Flask test klijenta. Rezultat se sprema kao JSON zajedno s commitom i verzijama,
+a --compare ispisuje razliku prema ranijem rezultatu.
+
+    python benchmarks/run_benchmarks.py                           # 10k i 100k
+    python benchmarks/run_benchmarks.py --sizes 1m --cases server. search.
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/prije.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_data import SEED, SIZES, generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+REPEAT = 20
+# Millisecond timings move by ~20% between runs, --compare only flags bigger changes
+NOISE = 0.25
+
+def measure(function, repeat):
+    """ min/median/p95/max u milisekundama; prvi poziv zagrijava cache i ne broji se """
+    if repeat > 1:
+        function()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": round(times[0], 3),
+        "median_ms": round(times[len(times) // 2], 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        "max_ms": round(times[-1], 3),
+    }
+
+# Benchmarks, run in a child process whose INVENTORY_DB is a copy of the dataset
+def benchmark_cases(items, work_dir):
+    """ [(naziv, funkcija, broj ponavljanja ili None za zadani)]; QApplication mora već postojati """
+    # app and server read INVENTORY_DB and set up the schema when imported
+    from PyQt6.QtCore import QEventLoop, QTimer
+
+    import app
+    import db
+    import exporter
+    import labels
+    import server
+    from fts import search_equipment
+
+    rng = random.Random(SEED)
+
+    def run_until(signal, action, timeout_ms=120_000):
+        # Connected before the action starts: a worker thread may emit before loop.exec()
+        loop = QEventLoop()
+        signal.connect(loop.quit)
+        QTimer.singleShot(timeout_ms, loop.quit)
+        action()
+        loop.exec()
+        signal.disconnect(loop.quit)
+
+    # The constructor starts the first search; its result arrives through the event loop
+    window = app.ITInventory()
+    run_until(window.search_pipeline.search_finished, lambda: None)
+
+    def first_page(text=""):
+        window.search_input.setText(text)
+        run_until(window.search_pipeline.search_finished, window.load_equipment)
+
+    def scroll(rows):
+        first_page()
+        while window.model.rowCount() < rows and window.model.canFetchMore():
+            run_until(window.search_pipeline.signals.page_done, window.model.fetchMore)
+
+    # Employee 1 holds the most equipment in generated data
+    with db.connection() as conn:
+        employee_name = conn.execute("SELECT first_name || ' ' || last_name FROM employees WHERE id = 1").fetchone()[0]
+
+    def reserve_ids():
+        with db.transaction() as conn:
+            db.reserve_ids(conn, "equipment", 1000)
+
+    def search(text, ranked):
+        with db.connection() as conn:
+            search_equipment(conn.cursor(), text, limit=100, ranked=ranked)
+
+    # The test client reads streamed bodies to the end, so a listing is timed in full
+    client = server.app.test_client()
+    etag = [""]
+    employees = max(1, items // 8)
+
+    def get(url):
+        response = client.get(url)
+        response.get_data()
+        assert response.status_code in (200, 304), (url, response.status_code)
+
+    def get_not_modified():
+        # The warm-up call picks up the current ETag, the timed ones get 304
+        response = client.get("/equipment?limit=100", headers={"If-None-Match": etag[0]})
+        if response.status_code == 200:
+            etag[0] = response.headers["ETag"]
+
+    def post(url, body):
+        response = client.post(url, json=body)
+        assert response.status_code in (200, 202), (url, response.status_code)
+
+    heavy = 1 if items > 100_000 else 3
+    return [
+        ("app.load_equipment", lambda: first_page(), None),
+        ("app.search_common", lambda: first_page("dell"), None),
+        ("app.search_employee", lambda: first_page(employee_name), None),
+        ("app.scroll_5000", lambda: scroll(5000), 5),
+        ("app.add_equipment", lambda: window.cache.add_equipment("Dell P2422H", "Monitor", None), None),
+        ("db.reserve_ids_1000", reserve_ids, None),
+
+        ("search.prefix", lambda: search("lenov", False), None),
+        ("search.ranked", lambda: search("logitech mx", True), None),
+
+        # Reads first: audits below change the ETag
+        ("server.equipment_page", lambda: get(f"/equipment?limit=100&after_id={rng.randrange(items)}"), None),
+        ("server.equipment_filtered", lambda: get("/equipment?category=Laptop&assigned=false&limit=100"), None),
+        ("server.equipment_search", lambda: get("/equipment?q=thinkpad&limit=100"), None),
+        ("server.equipment_304", get_not_modified, None),
+        ("server.equipment_all", lambda: get("/equipment"), heavy),
+        ("server.employees_page", lambda: get(f"/employees?limit=100&after_id={rng.randrange(employees)}"), None),
+        ("server.employees_all", lambda: get("/employees"), heavy),
+        ("server.audit", lambda: post("/audit", {"equipment_id": rng.randint(1, items)}), 200),
+        ("server.audit_batch_100",
+         lambda: post("/audit/batch", {"scans": [{"equipment_id": rng.randint(1, items)} for _ in range(100)]}), None),
+
+        ("export.csv", lambda: exporter.export_equipment(os.path.join(work_dir, "izvoz.csv")), heavy),
+        ("export.xlsx", lambda: exporter.export_equipment(os.path.join(work_dir, "izvoz.xlsx")), heavy),
+
+        ("qr.make_qr_image", lambda: labels.make_qr_image(rng.randint(1, items)), 50),
+        ("qr.regenerate_200", lambda: labels.regenerate_labels(
+            range(1, 201), directory=os.path.join(work_dir, "qr_codes"), force=True), 3),
+    ]
+
+def run_child(items, repeat, selected, output):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, ROOT)
+    from PyQt6.QtWidgets import QApplication
+
+    # Kept in a name: the window's widgets live only as long as the QApplication
+    qt = QApplication([])
+    work_dir = os.path.dirname(os.environ["INVENTORY_DB"])
+    results = {}
+    for name, function, case_repeat in benchmark_cases(items, work_dir):
+        if selected and not any(name.startswith(prefix) for prefix in selected):
+            continue
+        results[name] = measure(function, case_repeat or repeat)
+        print(f"  {name:<28} {results[name]['median_ms']:>10.2f} ms", flush=True)
+
+    with open(output, "w") as f:
+        json.dump(results, f)
+
+# Parent: datasets, one child per size, result file
+def dataset(size, seed, cache_dir):
+    path = os.path.join(cache_dir, f"inventory_bench_{size}_{seed}.db")
+    if not os.path.exists(path):
+        print(f"Generiram '{path}'...", flush=True)
+        generate(path, SIZES[size], seed)
+    return path
+
+def run_size(size, seed, cache_dir, repeat, selected):
+    source = dataset(size, seed, cache_dir)
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "inventory.db")
+        shutil.copyfile(source, path)
+        output = os.path.join(work_dir, "results.json")
+
+        command = [sys.executable, os.path.abspath(__file__), "--child", str(SIZES[size]), "--child-output", output,
+                   "--repeat", str(repeat), "--cases", *selected]
+        # Working directory is the scratch directory: QR codes and audit journals stay out of the repo
+        subprocess.run(command, cwd=work_dir, env=dict(os.environ, INVENTORY_DB=path), check=True)
+
+        with open(output) as f:
+            return json.load(f)
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+def compare(old, new):
+    """ Ispisuje medijane oba rezultata i promjenu; sporije od NOISE je označeno s '!' """
+    print(f"\n{'veličina':<9} {'mjerenje':<28} {'prije ms':>10} {'sada ms':>10} {'promjena':>9}")
+    for size, cases in new["results"].items():
+        for name, result in cases.items():
+            before = old["results"].get(size, {}).get(name)
+            if before is None or not before["median_ms"]:
+                continue
+            change = result["median_ms"] / before["median_ms"] - 1
+            mark = " !" if change > NOISE else ""
+            print(f"{size:<9} {name:<28} {before['median_ms']:>10.2f} {result['median_ms']:>10.2f} "
+                  f"{change * 100:>+8.0f}%{mark}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["10k", "100k"])
+    parser.add_argument("--cases", nargs="*", default=[], help="samo mjerenja čiji naziv počinje s nečim od ovoga")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--cache-dir", default=tempfile.gettempdir(), help="gdje se čuvaju generirane baze")
+    parser.add_argument("--output", help=f"JSON s rezultatima, zadano u {os.path.relpath(RESULTS_DIR, ROOT)}/")
+    parser.add_argument("--compare", help="raniji JSON s rezultatima za usporedbu")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.repeat, args.cases, args.child_output)
+        return
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"{size}:", flush=True)
+        report["results"][size] = run_size(size, args.seed, args.cache_dir, args.repeat, args.cases)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nepoznato'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRezultati spremljeni u '{output}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+""" Trajanje pokretanja aplikacije: uvoz modula i vrijeme do prvog iscrtavanja prozora
+
+Svako mjerenje je novi Python proces nad kopijom sintetičke baze (generate_data.py).
+Uvoz se mjeri s -X importtime, a pokretanje kao u app.py (Qt bez prozora): od
+pokretanja procesa do prvog iscrtanog prozora, prve stranice opreme i učitanih
+djelatnika. Teški paketi (pandas, matplotlib, qrcode...) se pri pokretanju ne smiju
+uvesti. Izlazni kod je 1 ako je medijan iznad budžeta ili se uvezao neki od njih.
+
+    python benchmarks/startup.py                       # 10k, provjera budžeta
+    python benchmarks/startup.py --size 1m --repeat 5
+    python benchmarks/startup.py --budget-paint 800 --top 25
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_data import SEED, SIZES
+from run_benchmarks import dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEAT = 5
+
+# Milliseconds, from process start; a thin client is about three times slower than a dev machine
+BUDGETS = {"import_ms": 600, "first_paint_ms": 1500}
+# Loaded by the features that use them, never while the window opens
+LAZY_MODULES = ("pandas", "numpy", "matplotlib", "qrcode", "PIL", "openpyxl", "pyarrow")
+
+MILESTONES = ("imports", "window", "first_paint", "first_page", "employees")
+
+# Import times
+def import_times(env, work_dir):
+    """ {modul: (vlastito ms, ukupno ms, dubina)} za module koje uvozi `import app`, u novom procesu """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=work_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    # A module is listed after everything it imports, so app's subtree is what comes
+    # between the previous top-level line and app itself; the rest is interpreter startup
+    subtree = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        subtree[name.strip()] = (int(own) / 1000, int(cumulative) / 1000, depth)
+        if depth == 0:
+            if name.strip() == "app":
+                return subtree
+            subtree = {}
+    raise RuntimeError("`import app` nije u ispisu -X importtime")
+
+def print_import_times(modules, top):
+    print(f"\n`import app` ukupno {modules['app'][1]:.0f} ms; najsporiji izravni uvozi:")
+    direct = [(name, value) for name, value in modules.items() if value[2] == 1]
+    for name, (_, cumulative, _) in sorted(direct, key=lambda item: -item[1][1])[:top]:
+        print(f"  {name:<40} {cumulative:>8.1f} ms")
+
+# Startup, run in a child process
+def run_child():
+    """ Pokreće aplikaciju kao app.py i ispisuje JSON s trenucima u ms od pokretanja procesa """
+    started = float(os.environ["STARTUP_T0"])
+    times = {}
+
+    def elapsed():
+        return round((time.time() - started) * 1000, 1)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, ROOT)
+    from PyQt6.QtCore import QEvent, QObject, QTimer
+    from PyQt6.QtWidgets import QApplication
+
+    import app
+    import db
+    times["imports"] = elapsed()
+
+    class FirstPaint(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Type.Paint and "first_paint" not in times:
+                times["first_paint"] = elapsed()
+                finish()
+            return False
+
+    def mark(name):
+        times.setdefault(name, elapsed())
+        finish()
+
+    def finish():
+        if all(name in times for name in MILESTONES):
+            qt.quit()
+
+    # Same steps as app.py when run directly
+    db.setup_databases()
+    qt = QApplication(sys.argv)
+    window = app.ITInventory()
+    times["window"] = elapsed()
+
+    first_paint = FirstPaint()
+    window.installEventFilter(first_paint)
+    window.search_pipeline.search_finished.connect(lambda *args: mark("first_page"))
+    if window.cache.employees_loaded:
+        times["employees"] = elapsed()
+    window.cache.employees_ready.connect(lambda: mark("employees"))
+    QTimer.singleShot(60_000, qt.quit)
+
+    window.show()
+    qt.exec()
+    print(json.dumps(times))
+
+# Parent
+def startup_times(env, work_dir):
+    env = dict(env, STARTUP_T0=repr(time.time()))
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], cwd=work_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=list(SIZES), default="10k")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--cache-dir", default=tempfile.gettempdir(), help="gdje se čuvaju generirane baze")
+    parser.add_argument("--budget-import", type=float, default=BUDGETS["import_ms"], help="ms za `import app`")
+    parser.add_argument("--budget-paint", type=float, default=BUDGETS["first_paint_ms"],
+                        help="ms od pokretanja procesa do prvog iscrtavanja")
+    parser.add_argument("--top", type=int, default=15, help="koliko najsporijih uvoza ispisati")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    source = dataset(args.size, args.seed, args.cache_dir)
+    problems = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "inventory.db")
+        shutil.copyfile(source, path)
+        env = dict(os.environ, INVENTORY_DB=path, PYTHONPATH=ROOT, QT_QPA_PLATFORM="offscreen")
+
+        # The first run brings the copied schema up to date and fills the bytecode cache
+        startup_times(env, work_dir)
+
+        imports = [import_times(env, work_dir) for _ in range(args.repeat)]
+        runs = [startup_times(env, work_dir) for _ in range(args.repeat)]
+
+    print_import_times(imports[-1], args.top)
+    import_ms = median([modules["app"][1] for modules in imports])
+    eager = sorted({name.split(".")[0] for modules in imports for name in modules} & set(LAZY_MODULES))
+    if eager:
+        problems.append(f"pri pokretanju se uvozi: {', '.join(eager)}")
+    if import_ms > args.budget_import:
+        problems.append(f"`import app` {import_ms:.0f} ms > {args.budget_import:.0f} ms")
+
+    print(f"\nPokretanje ({args.size}, medijan od {args.repeat}), ms od pokretanja procesa:")
+    for name in MILESTONES:
+        value = median([run[name] for run in runs if name in run])
+        print(f"  {name:<14} {'-' if value is None else f'{value:>8.1f}'}")
+    paint_ms = median([run.get("first_paint", float("inf")) for run in runs])
+    if paint_ms > args.budget_paint:
+        problems.append(f"prvo iscrtavanje {paint_ms:.0f} ms > {args.budget_paint:.0f} ms")
+
+    print()
+    for problem in problems:
+        print(f"PAO  {problem}")
+    if not problems:
+        print(f"ok   import {import_ms:.0f} / {args.budget_import:.0f} ms, "
+              f"prvo iscrtavanje {paint_ms:.0f} / {args.budget_paint:.0f} ms")
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+""" Skupne izmjene opreme: dodjela, oslobađanje, kategorija i brisanje za mnogo id-eva odjednom
+
+Id-evi idu u privremenu tablicu konekcije, a izmjena je jedna naredba nad svima
+(WHERE id IN (SELECT id FROM temp.bulk_ids)), kao i fts.bulk_insert. Funkcije se
+pozivaju unutar transakcije pozivatelja i vraćaju id-eve koji su stvarno postojali.
+"""
+MAX_IDS = 10_000
+
+SELECTED = "SELECT id FROM temp.bulk_ids"
+
+def select_ids(conn, equipment_ids):
+    """ Puni temp.bulk_ids i vraća postojeće id-eve opreme među njima, po id-u """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_ids (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.bulk_ids")
+    conn.executemany("INSERT OR IGNORE INTO temp.bulk_ids (id) VALUES (?)", ((i,) for i in equipment_ids))
+    return [row[0] for row in conn.execute(f"SELECT id FROM equipment WHERE id IN ({SELECTED}) ORDER BY id")]
+
+def assign(conn, equipment_ids, employee_id):
+    """ Dodjeljuje opremu djelatniku, ili je oslobađa kad je employee_id None """
+    if employee_id is not None and conn.execute("SELECT 1 FROM employees WHERE id = ?", (employee_id,)).fetchone() is None:
+        raise ValueError(f"nepoznat djelatnik id '{employee_id}'")
+    found = select_ids(conn, equipment_ids)
+    # Rows that already have this assignee are left alone: no trigger, FTS or change log work
+    conn.execute(f"UPDATE equipment SET assigned_employee_id = ? WHERE id IN ({SELECTED}) "
+                 "AND assigned_employee_id IS NOT ?", (employee_id, employee_id))
+    return found
+
+def set_category(conn, equipment_ids, category):
+    category = (category or "").strip()
+    if not category:
+        raise ValueError("kategorija je obavezna")
+    found = select_ids(conn, equipment_ids)
+    conn.execute(f"UPDATE equipment SET category = ? WHERE id IN ({SELECTED}) AND category != ?", (category, category))
+    return found
+
+def delete(conn, equipment_ids):
+    found = select_ids(conn, equipment_ids)
+    conn.execute(f"DELETE FROM equipment WHERE id IN ({SELECTED})")
+    return found
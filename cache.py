@@ -0,0 +1,472 @@
+""" Zajednički podaci aplikacije: djelatnici i ažuriranje učitanih redaka opreme
+
+Djelatnici se iz baze čitaju jednom, u pozadini nakon što se prozor prikaže, i drže
+u jednom modelu koji dijele tablica djelatnika i odabir djelatnika upisom (preko
+EmployeeIndex), pa otvaranje prozora ne čita bazu. Lokalni
+upisi idu kroz InventoryCache.write() i mijenjaju samo pogođene retke. Izmjene
+iz drugih procesa (npr. audit preko server.py) se otkrivaju preko
+PRAGMA data_version i brojača izmjena tablica, a u pozadini se iz change_log
+čitaju samo retci promijenjeni od zadnjeg čitanja (changes.py).
+"""
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+
+from PyQt6.QtCore import (
+    Qt, QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+)
+
+import bulk
+import changes
+import db
+
+POLL_MS = 1000
+READ_CHUNK = 500
+CHANGES_PAGE = 5000
+
+def display_name(employee):
+    return f"{employee[1]} {employee[2]} ({employee[3]})"
+
+def read_employees(conn):
+    return conn.execute("SELECT id, first_name, last_name, company FROM employees ORDER BY id").fetchall()
+
+# Employees, sorted by id
+class EmployeeModel(QAbstractTableModel):
+    HEADERS = ["ID", "Ime", "Prezime", "Tvrtka"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._ids = []
+
+    def reload(self, conn):
+        self.set_rows(read_employees(conn))
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._rows = rows
+        self._ids = [row[0] for row in rows]
+        self.endResetModel()
+
+    def position(self, employee_id):
+        position = bisect_left(self._ids, employee_id)
+        if position < len(self._ids) and self._ids[position] == employee_id:
+            return position
+        return None
+
+    def employee(self, position):
+        return self._rows[position]
+
+    def rows(self):
+        return self._rows
+
+    def insert(self, employee):
+        position = bisect_left(self._ids, employee[0])
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.insert(position, employee)
+        self._ids.insert(position, employee[0])
+        self.endInsertRows()
+
+    def upsert(self, employee):
+        """ Dodaje ili zamjenjuje djelatnika; zamjena je brisanje i dodavanje, da ih EmployeeIndex prati """
+        position = self.position(employee[0])
+        if position is not None:
+            if self._rows[position] == employee:
+                return
+            self.remove(employee[0])
+        self.insert(employee)
+
+    def remove(self, employee_id):
+        position = self.position(employee_id)
+        if position is None:
+            return
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self._rows[position]
+        del self._ids[position]
+        self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(self._rows[index.row()][index.column()])
+        if role == Qt.ItemDataRole.UserRole:
+            return self._rows[index.row()][0]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+def fold(text):
+    """ Mala slova bez dijakritika, za usporedbu upisanog s imenima: "Đurić" -> "duric" """
+    text = unicodedata.normalize("NFKD", text.casefold().replace("đ", "d"))
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+def name_tokens(employee, folded=None):
+    """ Riječi imena, prezimena i tvrtke jednog djelatnika; folded pamti već obrađena polja """
+    folded = {} if folded is None else folded
+    tokens = set()
+    for field in employee[1:]:
+        words = folded.get(field)
+        if words is None:
+            words = folded[field] = re.findall(r"\w+", fold(field))
+        tokens.update(words)
+    return tokens
+
+def index_employees(rows):
+    """ (sortirane riječi, {riječ: sortirani id-evi}, {id: riječi}) za retke djelatnika poredane po id-u """
+    # The same first names and companies repeat across thousands of employees
+    folded = {}
+    ids = {}
+    tokens = {}
+    for employee in rows:
+        tokens[employee[0]] = name_tokens(employee, folded)
+        # Rows come by id, so every list stays sorted without sorting it
+        for token in tokens[employee[0]]:
+            ids.setdefault(token, []).append(employee[0])
+    return sorted(ids), ids, tokens
+
+# Type-ahead lookup of employees by the start of any word of their name or company
+class EmployeeIndex(QObject):
+    """ Za svaku riječ imena, prezimena i tvrtke sortirani id-evi djelatnika
+
+    Riječi su i same sortirane, pa je svaka upisana riječ raspon pronađen s dva
+    bisecta i pretraga ovisi o broju prijedloga, a ne o broju djelatnika. Indeks
+    gradi EmployeeLoader zajedno s retcima, ili ova klasa pri prvoj pretrazi nakon
+    ponovnog čitanja modela, i zatim prati dodavanja i brisanja u modelu.
+    """
+    # Ids looked at per lookup; several common first names together can match thousands
+    SCAN_LIMIT = 5000
+
+    def __init__(self, employees, parent=None):
+        super().__init__(parent)
+        self.employees = employees
+        self._words = None
+        self._ids = {}
+        self._tokens = {}
+
+        employees.modelReset.connect(self._invalidate)
+        employees.rowsInserted.connect(self._rows_inserted)
+        employees.rowsAboutToBeRemoved.connect(self._rows_removed)
+
+    def _invalidate(self):
+        self._words = None
+        self._ids = {}
+        self._tokens = {}
+
+    def adopt(self, index):
+        """ Indeks koji je index_employees() izgradio za trenutne retke modela """
+        self._words, self._ids, self._tokens = index
+
+    def _rows_inserted(self, parent, first, last):
+        if self._words is None:
+            return
+        for position in range(first, last + 1):
+            employee = self.employees.employee(position)
+            tokens = self._tokens[employee[0]] = name_tokens(employee)
+            for token in tokens:
+                if token not in self._ids:
+                    self._ids[token] = []
+                    insort(self._words, token)
+                insort(self._ids[token], employee[0])
+
+    def _rows_removed(self, parent, first, last):
+        if self._words is None:
+            return
+        for position in range(first, last + 1):
+            employee_id = self.employees.employee(position)[0]
+            for token in self._tokens.pop(employee_id, ()):
+                ids = self._ids[token]
+                del ids[bisect_left(ids, employee_id)]
+                if not ids:
+                    del self._ids[token]
+                    del self._words[bisect_left(self._words, token)]
+
+    def _matching_words(self, word):
+        return self._words[bisect_left(self._words, word):bisect_left(self._words, word + "\uffff")]
+
+    def search(self, text, limit=20):
+        """ Djelatnici kod kojih svaka upisana riječ započinje neku riječ imena, prezimena ili tvrtke """
+        words = re.findall(r"\w+", fold(text))
+        if not words:
+            return []
+        if self._words is None:
+            self.adopt(index_employees(self.employees.rows()))
+
+        # Walk the ids of the rarest word, the other words are checked against each candidate
+        matching = {word: self._matching_words(word) for word in words}
+        rarest = min(matching, key=lambda word: sum(len(self._ids[token]) for token in matching[word]))
+        others = [word for word in words if word != rarest]
+
+        found = []
+        seen = set()
+        for token in matching[rarest]:
+            for employee_id in self._ids[token]:
+                if employee_id in seen:
+                    continue
+                seen.add(employee_id)
+                tokens = self._tokens[employee_id]
+                if all(any(token.startswith(word) for token in tokens) for word in others):
+                    found.append(self.employees.employee(self.employees.position(employee_id)))
+                if len(found) == limit or len(seen) == self.SCAN_LIMIT:
+                    return found
+        return found
+
+EQUIPMENT_COLUMNS = "id, name, category, assigned_to, last_audit, assigned_employee_id"
+
+def read_equipment(conn, equipment_ids):
+    """ Retci iz equipment_view za zadane id-eve, po id-u """
+    equipment_ids = list(equipment_ids)
+    rows = []
+    for i in range(0, len(equipment_ids), READ_CHUNK):
+        chunk = equipment_ids[i:i + READ_CHUNK]
+        placeholders = ", ".join("?" * len(chunk))
+        rows += db.fetch_all(conn, "read_equipment",
+                             f"SELECT {EQUIPMENT_COLUMNS} FROM equipment_view WHERE id IN ({placeholders}) ORDER BY id",
+                             chunk)
+    return rows
+
+# All employees read off the GUI thread, with the change counter of the same snapshot
+class EmployeeLoaderSignals(QObject):
+    loaded = pyqtSignal(list, int, object)
+
+class EmployeeLoader(QRunnable):
+    def __init__(self):
+        super().__init__()
+        self.signals = EmployeeLoaderSignals()
+
+    def run(self):
+        with db.connection() as conn:
+            conn.execute("BEGIN")
+            rows = read_employees(conn)
+            version = db.table_versions(conn).get("employees")
+            conn.rollback()
+        # Built here too: for 100k+ employees it is the slow part and the GUI thread is free meanwhile
+        self.signals.loaded.emit(rows, version, index_employees(rows))
+
+# Rows changed by other processes since a change_log seq, read off the GUI thread
+class ChangeReaderSignals(QObject):
+    # next seq, {table: (rows, deleted ids)}, or None when the log no longer reaches back to the seq
+    finished = pyqtSignal(int, object)
+
+class ChangeReader(QRunnable):
+    def __init__(self, since):
+        super().__init__()
+        self.since = since
+        self.signals = ChangeReaderSignals()
+
+    def run(self):
+        upserts = {table: {} for table in changes.TABLES}
+        deletes = {table: set() for table in changes.TABLES}
+        since = self.since
+        try:
+            with db.connection() as conn:
+                more = True
+                while more:
+                    since, more, changed = changes.changes_since(conn, since, CHANGES_PAGE)
+                    # A row changed again between pages keeps only its latest state
+                    for table, (rows, deleted) in changed.items():
+                        for row in rows:
+                            upserts[table][row[0]] = row
+                            deletes[table].discard(row[0])
+                        for row_id in deleted:
+                            upserts[table].pop(row_id, None)
+                            deletes[table].add(row_id)
+        except changes.ResyncRequired as e:
+            self.signals.finished.emit(e.seq, None)
+            return
+        self.signals.finished.emit(since, {table: (list(upserts[table].values()), sorted(deletes[table]))
+                                           for table in changes.TABLES})
+
+class InventoryCache(QObject):
+    # Rows as in equipment_view, re-read after a change; ids that no longer exist
+    equipment_changed = pyqtSignal(list)
+    equipment_removed = pyqtSignal(list)
+    equipment_inserted = pyqtSignal(list)
+    # Changes could not be read from change_log, loaded rows should be re-read
+    equipment_stale = pyqtSignal()
+    employees_ready = pyqtSignal()
+
+    def __init__(self, parent=None, poll_ms=POLL_MS):
+        super().__init__(parent)
+        self.employees = EmployeeModel(self)
+        self.employee_index = EmployeeIndex(self.employees, self)
+
+        # Own connection: data_version only moves for commits made by other connections
+        self._conn = db.connect(db.INVENTORY_DB)
+        self._data_version = self._read_data_version()
+        self._versions = db.table_versions(self._conn)
+        self._seq = changes.current_seq(self._conn)
+
+        # One ChangeReader at a time; local writes made while it reads make it read again
+        self._reader = None
+        self._read_again = False
+        self._writes = 0
+        self._writes_at_read = 0
+
+        # The window shows with an empty employee list, filled in once the loader is done
+        self.employees_loaded = False
+        self._employee_loader = EmployeeLoader()
+        self._employee_loader.signals.loaded.connect(self._employees_loaded)
+        QThreadPool.globalInstance().start(self._employee_loader)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(poll_ms)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start()
+
+    def _read_data_version(self):
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def write(self):
+        """ Transakcija za lokalni upis; brojači izmjena se pamte pa poll() ne čita ponovno ono što je već osvježeno """
+        with db.transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = db.table_versions(conn)
+            yield conn
+            after = db.table_versions(conn)
+            seq = changes.current_seq(conn)
+        self._writes += 1
+
+        # Only when nobody else wrote since the last check, otherwise poll() has work to do
+        if before == self._versions:
+            self._versions = after
+            if self._reader is None:
+                self._seq = seq
+
+    def poll(self):
+        """ Provjera izmjena iz drugih procesa; bez izmjena je to jedan PRAGMA """
+        data_version = self._read_data_version()
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+
+        versions = db.table_versions(self._conn)
+        changed = any(versions.get(table) != self._versions.get(table) for table in changes.TABLES)
+        self._versions = versions
+        if changed:
+            self.read_changes()
+
+    def read_changes(self):
+        """ Čita izmjene nakon zadnjeg pročitanog seq u pozadini; trošak prati broj promijenjenih redaka """
+        if self._reader is not None:
+            self._read_again = True
+            return
+
+        self._reader = ChangeReader(self._seq)
+        self._writes_at_read = self._writes
+        self._reader.signals.finished.connect(self._changes_read)
+        QThreadPool.globalInstance().start(self._reader)
+
+    def _changes_read(self, next_seq, changed):
+        self._reader = None
+        # A local write during the read may be newer than the rows read, read again from the same seq
+        if self._writes != self._writes_at_read:
+            self.read_changes()
+            return
+        self._seq = next_seq
+
+        if changed is None:
+            self.employees.reload(self._conn)
+            self.equipment_stale.emit()
+        else:
+            employees, removed_employees = changed["employees"]
+            for employee in employees:
+                self.employees.upsert(employee)
+            for employee_id in removed_employees:
+                self.employees.remove(employee_id)
+
+            equipment, removed_equipment = changed["equipment"]
+            if equipment:
+                self.equipment_changed.emit(equipment)
+            if removed_equipment:
+                self.equipment_removed.emit(removed_equipment)
+
+        if self._read_again:
+            self._read_again = False
+            self.read_changes()
+
+    def _employees_loaded(self, rows, version, index):
+        # Written or polled since the loader's snapshot: its rows may be missing that
+        if version == self._versions.get("employees"):
+            self.employees.set_rows(rows)
+            self.employee_index.adopt(index)
+        else:
+            self.employees.reload(self._conn)
+        self.employees_loaded = True
+        self.employees_ready.emit()
+
+    def reload_employees(self):
+        self.employees.reload(self._conn)
+
+    def refresh_equipment(self, equipment_ids):
+        """ Ponovno čita zadane retke opreme i javlja samo njih: equipment_changed / equipment_removed """
+        equipment_ids = list(equipment_ids)
+        rows = read_equipment(self._conn, equipment_ids)
+
+        found = {row[0] for row in rows}
+        removed = [equipment_id for equipment_id in equipment_ids if equipment_id not in found]
+        if rows:
+            self.equipment_changed.emit(rows)
+        if removed:
+            self.equipment_removed.emit(removed)
+
+    # Equipment writes: each returns the affected rows and tells the table about exactly those
+    def add_equipment(self, name, category, employee_id=None):
+        with self.write() as conn:
+            cursor = conn.execute("INSERT INTO equipment (name, category, assigned_employee_id) VALUES (?, ?, ?)",
+                                  (name, category, employee_id))
+            row = read_equipment(conn, [cursor.lastrowid])[0]
+
+        self.equipment_inserted.emit([row])
+        return row
+
+    # Bulk writes: one set-based statement in one transaction, then one signal for the table
+    def set_assignment(self, equipment_ids, employee_id):
+        """ Dodjeljuje opremu djelatniku, ili je oslobađa kad je employee_id None """
+        with self.write() as conn:
+            found = bulk.assign(conn, equipment_ids, employee_id)
+            rows = read_equipment(conn, found)
+
+        self.equipment_changed.emit(rows)
+        return rows
+
+    def set_category(self, equipment_ids, category):
+        with self.write() as conn:
+            found = bulk.set_category(conn, equipment_ids, category)
+            rows = read_equipment(conn, found)
+
+        self.equipment_changed.emit(rows)
+        return rows
+
+    def delete_equipment(self, equipment_ids):
+        with self.write() as conn:
+            found = bulk.delete(conn, equipment_ids)
+
+        self.equipment_removed.emit(found)
+        return found
+
+    def delete_employee(self, employee_id):
+        """ Briše djelatnika; njegovu opremu u istoj naredbi oslobađa ON DELETE SET NULL """
+        with self.write() as conn:
+            freed = [row[0] for row in conn.execute("SELECT id FROM equipment WHERE assigned_employee_id = ?",
+                                                    (employee_id,))]
+            conn.execute("DELETE FROM employees WHERE id = ?", (employee_id,))
+
+        self.employees.remove(employee_id)
+        self.refresh_equipment(freed)
+        return freed
+
+    def close(self):
+        self.timer.stop()
+        self._conn.close()
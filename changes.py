@@ -0,0 +1,182 @@
+""" Dnevnik izmjena opreme i djelatnika za klijente koji se sinkroniziraju (skeneri, druge lokacije)
+
+Triggeri za svaki upisani ili obrisani redak bilježe (tablica, id, upsert|delete) s
+novim rastućim brojem seq. Svaki redak ima samo jedan zapis, zadnju izmjenu, pa je
+sve što klijent s kursorom `since` nije vidio točno raspon seq > since, velik koliko
+i broj promijenjenih redaka, a ne broj izmjena ili veličina inventara.
+
+Zapisi stariji od RETENTION_DAYS se brišu (compact); klijent čiji je kursor stariji
+od obrisanog mora ponovno skinuti sve (ResyncRequired):
+
+    1. GET /changes              -> {"next": seq} trenutni kursor
+    2. GET /equipment, /employees   cijeli popisi
+    3. GET /changes?since=seq    ponavljati s vraćenim "next"
+
+    python changes.py status
+    python changes.py compact --days 7
+"""
+import argparse
+import time
+
+RETENTION_DAYS = 30
+READ_CHUNK = 500
+
+# Rows change their id never (AUTOINCREMENT, printed QR labels), so a row is its table and id
+CHANGE_LOG_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        ts INTEGER NOT NULL
+    )
+'''
+
+CHANGE_LOG_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_row ON change_log (table_name, row_id)"
+
+# Highest seq removed by compaction; a cursor below it has missed changes
+CHANGE_LOG_STATE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS change_log_state (
+        compacted_through INTEGER NOT NULL
+    )
+'''
+
+# The older entry of the row goes first, so a row is always a single entry with a new seq.
+# DELETE + INSERT rather than INSERT OR REPLACE: an outer INSERT OR IGNORE would turn the
+# trigger's REPLACE into IGNORE and the change would be lost
+CHANGE_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS {table}_change_{event_name} AFTER {event} ON {table}
+    BEGIN
+        DELETE FROM change_log WHERE table_name = '{table}' AND row_id = {row}.id;
+        INSERT INTO change_log (table_name, row_id, op, ts)
+        VALUES ('{table}', {row}.id, '{op}', CAST(strftime('%s', 'now') AS INTEGER));
+    END
+'''
+
+# Equipment carries the display name of its assignee, a rename changes those rows too
+EMPLOYEE_RENAME_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS employees_change_equipment
+    AFTER UPDATE OF first_name, last_name, company ON employees
+    BEGIN
+        DELETE FROM change_log
+        WHERE table_name = 'equipment' AND row_id IN (SELECT id FROM equipment WHERE assigned_employee_id = new.id);
+        INSERT INTO change_log (table_name, row_id, op, ts)
+        SELECT 'equipment', id, 'upsert', CAST(strftime('%s', 'now') AS INTEGER)
+        FROM equipment WHERE assigned_employee_id = new.id;
+    END
+'''
+
+# What a client gets for each table, same columns as /equipment and /employees
+TABLES = {
+    "equipment": "SELECT id, name, category, assigned_to, last_audit, assigned_employee_id FROM equipment_view",
+    "employees": "SELECT id, first_name, last_name, company FROM employees",
+}
+
+# Why a cursor can't be continued: older than the compacted part of the log, or newer
+# than anything in this database (restored from a backup or swapped for another one)
+COMPACTED = "compacted"
+AHEAD = "ahead"
+
+class ResyncRequired(Exception):
+    """ Kursor je stariji od sažetog dijela dnevnika ili noviji od baze; seq je novi početni kursor """
+    def __init__(self, seq, reason=COMPACTED):
+        super().__init__(seq, reason)
+        self.seq = seq
+        self.reason = reason
+
+def setup_change_log(conn):
+    """ Tablica, indeks i triggeri; migracija u db.MIGRATIONS, dnevnik počinje prazan """
+    conn.execute(CHANGE_LOG_SCHEMA)
+    conn.execute(CHANGE_LOG_INDEX)
+    conn.execute(CHANGE_LOG_STATE_SCHEMA)
+    conn.execute("INSERT INTO change_log_state (compacted_through) "
+                 "SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM change_log_state)")
+    for table in TABLES:
+        for event, row, op in (("INSERT", "new", "upsert"), ("UPDATE", "new", "upsert"), ("DELETE", "old", "delete")):
+            conn.execute(CHANGE_TRIGGER.format(table=table, event=event, event_name=event.lower(), row=row, op=op))
+    conn.execute(EMPLOYEE_RENAME_TRIGGER)
+
+def current_seq(conn):
+    """ Zadnji dodijeljeni seq, i kad je njegov zapis već zamijenjen ili sažet """
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+def compacted_through(conn):
+    return conn.execute("SELECT compacted_through FROM change_log_state").fetchone()[0]
+
+def _rows_by_id(conn, table, ids):
+    rows = {}
+    for i in range(0, len(ids), READ_CHUNK):
+        chunk = ids[i:i + READ_CHUNK]
+        query = f"{TABLES[table]} WHERE id IN ({', '.join('?' * len(chunk))})"
+        rows.update((row[0], row) for row in conn.execute(query, chunk))
+    return rows
+
+def changes_since(conn, since, limit):
+    """ Izmjene nakon `since`, najviše `limit` redaka
+
+    Vraća (next, more, {tablica: (retci za upis, id-evi za brisanje)}). Retci su
+    trenutno stanje iz istog snimka baze kao i dnevnik. Baca ResyncRequired ako
+    klijent mora ponovno skinuti sve.
+    """
+    with conn:
+        # One read snapshot for the cursor check, the log and the rows
+        conn.execute("BEGIN")
+        seq = current_seq(conn)
+        if since > seq:
+            raise ResyncRequired(seq, AHEAD)
+        if since < compacted_through(conn):
+            raise ResyncRequired(seq, COMPACTED)
+
+        entries = conn.execute("SELECT seq, table_name, row_id, op FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?",
+                               (since, limit + 1)).fetchall()
+        more = len(entries) > limit
+        entries = entries[:limit]
+
+        changes = {}
+        for table in TABLES:
+            upserted = [row_id for _, name, row_id, op in entries if name == table and op == "upsert"]
+            deleted = [row_id for _, name, row_id, op in entries if name == table and op == "delete"]
+            rows = _rows_by_id(conn, table, upserted)
+            changes[table] = ([rows[row_id] for row_id in upserted if row_id in rows], deleted)
+
+    # Without entries the client is up to date as of the newest seq, even if its entry was replaced
+    next_seq = entries[-1][0] if more else seq
+    return next_seq, more, changes
+
+def compact(conn, days=RETENTION_DAYS, now=None):
+    """ Briše zapise starije od `days` dana i vraća koliko ih je obrisano
+
+    Zapisi idu po seq redom kojim su nastali, pa se granica nalazi čitanjem samo
+    zapisa koji se brišu, bez indeksa po vremenu.
+    """
+    cutoff = int(now if now is not None else time.time()) - days * 86400
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        first_kept = conn.execute("SELECT seq FROM change_log WHERE ts >= ? ORDER BY seq LIMIT 1", (cutoff,)).fetchone()
+        through = first_kept[0] - 1 if first_kept else current_seq(conn)
+        if through <= compacted_through(conn):
+            return 0
+        removed = conn.execute("DELETE FROM change_log WHERE seq <= ?", (through,)).rowcount
+        conn.execute("UPDATE change_log_state SET compacted_through = ?", (through,))
+    return removed
+
+def main():
+    import db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="kursor, sažeti dio i broj zapisa")
+    compact_command = commands.add_parser("compact", help="obriši stare zapise")
+    compact_command.add_argument("--days", type=int, default=RETENTION_DAYS)
+    args = parser.parse_args()
+
+    db.setup_databases()
+    with db.connection() as conn:
+        if args.command == "compact":
+            print(f"Obrisano zapisa: {compact(conn, args.days)}")
+        count = conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+        print(f"seq {current_seq(conn)}, sažeto do {compacted_through(conn)}, zapisa {count}")
+
+if __name__ == "__main__":
+    main()
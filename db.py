@@ -0,0 +1,383 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metrics
+from changes import setup_change_log
+from fts import drop_fts, setup_fts
+
+INVENTORY_DB = os.environ.get("INVENTORY_DB", "inventory.db")
+# Employees used to live in their own file, it is only read to migrate them
+LEGACY_EMPLOYEES_DB = os.environ.get("EMPLOYEES_DB", "employees.db")
+
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+
+# Applied to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",        # readers don't block the writer and vice versa
+    "PRAGMA synchronous = NORMAL",      # safe with WAL, fsync only at checkpoints
+    "PRAGMA cache_size = -32000",       # 32 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",     # 256 MB memory mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",         # ON DELETE SET NULL frees equipment of a deleted employee
+)
+
+CONNECTIONS_OPENED = metrics.Counter("inventory_db_connections_opened_total", "Nove SQLite konekcije")
+CONNECTION_SECONDS = metrics.Histogram("inventory_db_connection_seconds", "Koliko dugo je konekcija posuđena iz poola")
+# execute() steps SQLite to the first row, fetchall() through the rest and builds the tuples
+QUERY_SECONDS = metrics.Histogram("inventory_db_query_seconds", "Izvršavanje upita do prvog retka", ("query",))
+FETCH_SECONDS = metrics.Histogram("inventory_db_fetch_seconds", "Čitanje ostalih redaka u Python n-torke", ("query",))
+ROWS = metrics.Counter("inventory_db_rows_total", "Pročitani retci", ("query",))
+
+def connect(path):
+    """ Nova konekcija s podešenim pragmama i cacheom pripremljenih upita """
+    conn = sqlite3.connect(path, timeout=5, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+    CONNECTIONS_OPENED.inc()
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+# Pool of open connections for one database file
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = connect(self.path)
+
+        try:
+            with CONNECTION_SECONDS.time():
+                yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=INVENTORY_DB):
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+@contextmanager
+def connection(path=INVENTORY_DB):
+    """ Posuđuje konekciju iz poola; vraća se u pool na izlasku iz bloka """
+    with get_pool(path).connection() as conn:
+        yield conn
+
+@contextmanager
+def transaction(path=INVENTORY_DB):
+    """ Kao connection(), ali commit na kraju bloka ili rollback ako dođe do greške """
+    with get_pool(path).connection() as conn:
+        with conn:
+            yield conn
+
+def fetch_all(conn, name, query, params=()):
+    """ execute() + fetchall(); uz uključene metrike se izvršavanje i čitanje redaka mjere odvojeno pod imenom `name` """
+    with QUERY_SECONDS.time(name):
+        cursor = conn.execute(query, params)
+    with FETCH_SECONDS.time(name):
+        rows = cursor.fetchall()
+    ROWS.inc(len(rows), name)
+    return rows
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+# Schema
+# AUTOINCREMENT so a deleted id is never handed out again, a printed QR label
+# must not start pointing at a different piece of equipment
+EQUIPMENT_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category TEXT NOT NULL,
+        last_audit TEXT,
+        assigned_employee_id INTEGER REFERENCES employees (id) ON DELETE SET NULL
+    )
+'''
+
+EMPLOYEES_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        company TEXT NOT NULL
+    )
+'''
+
+# Every index also holds the rowid, so "column = ? AND id > ? ORDER BY id" (one page
+# of a filtered listing) is a range on the index and COUNT(*) by column never touches
+# the table. last_audit has no index: a page filtered by it walks the id order and
+# stops after `limit` rows, and every audit would pay for keeping one up to date.
+# benchmarks/query_plans.py checks that the queries actually use these
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_equipment_assigned_employee ON equipment (assigned_employee_id)",
+    "CREATE INDEX IF NOT EXISTS idx_equipment_category ON equipment (category)",
+    "CREATE INDEX IF NOT EXISTS idx_employees_company ON employees (company)",
+)
+
+# Rows done per imported file (source key), so an interrupted import resumes where it stopped
+IMPORT_PROGRESS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS import_progress (
+        source TEXT PRIMARY KEY,
+        rows_done INTEGER NOT NULL
+    )
+'''
+
+# Every scan, never updated or deleted. ts is Unix time in seconds (UTC), so ranges
+# and "last seen" are integer comparisons on the index; one scan per item per second
+AUDIT_LOG_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS audit_log (
+        id INTEGER PRIMARY KEY,
+        equipment_id INTEGER NOT NULL,
+        ts INTEGER NOT NULL
+    )
+'''
+
+AUDIT_LOG_INDEXES = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_log_equipment_ts ON audit_log (equipment_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_log_ts ON audit_log (ts, equipment_id)",
+)
+
+# Equipment with the display name of the assignee, 'Slobodno' when unassigned
+EQUIPMENT_VIEW = '''
+    CREATE VIEW IF NOT EXISTS equipment_view AS
+    SELECT equipment.id, equipment.name, equipment.category,
+           IFNULL(employees.first_name || ' ' || employees.last_name || ' (' || employees.company || ')',
+                  'Slobodno') AS assigned_to,
+           equipment.last_audit, equipment.assigned_employee_id
+    FROM equipment LEFT JOIN employees ON employees.id = equipment.assigned_employee_id
+'''
+
+# Change counter per table, bumped by triggers on every write. HTTP clients get it
+# back as an ETag, so "has anything changed" is a single-row lookup
+VERSIONED_TABLES = ("equipment", "employees")
+
+TABLE_VERSIONS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS table_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+'''
+
+TABLE_VERSION_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS {table}_version_{name} AFTER {event} ON {table}
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+    END
+'''
+
+# Bumped only when equipment rows come or go, not when a scan updates last_audit;
+# audit.KnownIds reloads its ids on this one
+EQUIPMENT_IDS_VERSION = "equipment_ids"
+
+EQUIPMENT_IDS_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS equipment_ids_version_{name} AFTER {event} ON equipment
+    BEGIN
+        UPDATE table_versions SET version = version + 1 WHERE name = 'equipment_ids';
+    END
+'''
+
+def table_versions(conn):
+    """ {tablica: broj izmjena}; mijenja se pri svakom upisu u tu tablicu """
+    return dict(conn.execute("SELECT name, version FROM table_versions"))
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def reserve_ids(conn, table, count=1, above=0):
+    """ Rezervira `count` uzastopnih id-eva iznad postojećih i iznad `above`, vraća prvi
+
+    Za uvoz više redaka odjednom; obični INSERT bez id-a dobiva sljedeći id sam.
+    `above` je najveći id koji isti upis donosi sam, a još nije u tablici. Poziva
+    se unutar transakcije koja zatim i upisuje retke.
+    """
+    conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT ?, 0 "
+                 "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)", (table, table))
+    conn.execute(f"UPDATE sqlite_sequence SET seq = max(seq, (SELECT IFNULL(MAX(id), 0) FROM {table}), ?) + ? "
+                 "WHERE name = ?", (above, count, table))
+    last = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()[0]
+    return last - count + 1
+
+# Migrations
+# Each step runs in its own transaction together with the PRAGMA user_version bump,
+# so a step is either fully applied or not at all. Steps don't commit on their own.
+# Databases from before user_version start at 0 and go through every step, which is
+# why the early steps check what is already there instead of assuming an empty file.
+def create_tables(conn):
+    conn.execute(EMPLOYEES_SCHEMA.format(table="employees"))
+    conn.execute(EQUIPMENT_SCHEMA.format(table="equipment"))
+
+def migrate_employees_db(conn):
+    """ Kopira djelatnike iz stare employees.db u glavnu bazu, s istim id-evima
+
+    Samo za stare baze u kojima je oprema još dodijeljena po imenu.
+    """
+    if "assigned_to" not in table_columns(conn, "equipment"):
+        return
+    main_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not os.path.exists(LEGACY_EMPLOYEES_DB) or os.path.abspath(LEGACY_EMPLOYEES_DB) == os.path.abspath(main_path):
+        return
+    if conn.execute("SELECT 1 FROM employees LIMIT 1").fetchone():
+        return
+
+    # Read through its own connection: ATTACH is not allowed inside the migration transaction
+    legacy = sqlite3.connect(LEGACY_EMPLOYEES_DB)
+    try:
+        if legacy.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'employees'").fetchone():
+            conn.executemany("INSERT INTO employees (id, first_name, last_name, company) VALUES (?, ?, ?, ?)",
+                             legacy.execute("SELECT id, first_name, last_name, company FROM employees"))
+    finally:
+        legacy.close()
+
+def migrate_assigned_to(conn):
+    """ Zamjenjuje tekst "Ime Prezime (Tvrtka)" u equipment.assigned_to s assigned_employee_id
+
+    Tekst koji ne odgovara nijednom djelatniku ostaje bez dodjele, jer ta oprema
+    ionako više nije bila povezana ni s kim.
+    """
+    if "assigned_to" not in table_columns(conn, "equipment"):
+        return
+
+    drop_fts(conn)
+    if "assigned_employee_id" not in table_columns(conn, "equipment"):
+        conn.execute("ALTER TABLE equipment ADD COLUMN assigned_employee_id INTEGER "
+                     "REFERENCES employees (id) ON DELETE SET NULL")
+    conn.execute('''
+        UPDATE equipment SET assigned_employee_id = (
+            SELECT MIN(employees.id) FROM employees
+            WHERE employees.first_name || ' ' || employees.last_name || ' (' || employees.company || ')'
+                  = equipment.assigned_to
+        )
+        WHERE assigned_to IS NOT NULL AND assigned_to != 'Slobodno'
+    ''')
+    conn.execute("ALTER TABLE equipment DROP COLUMN assigned_to")
+
+def migrate_to_autoincrement(conn):
+    """ Prebacuje opremu sa slučajnih id-eva na AUTOINCREMENT, postojeći id-evi ostaju isti """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'equipment'").fetchone()
+    if "AUTOINCREMENT" in row[0].upper():
+        return
+
+    # The view would block the rename while its table is missing; FTS triggers go with
+    # the old table. Both are created again by the steps that follow
+    conn.execute("DROP VIEW IF EXISTS equipment_view")
+    columns = ", ".join(table_columns(conn, "equipment"))
+    conn.execute(EQUIPMENT_SCHEMA.format(table="equipment_new"))
+    conn.execute(f"INSERT INTO equipment_new ({columns}) SELECT {columns} FROM equipment")
+    conn.execute("DROP TABLE equipment")
+    conn.execute("ALTER TABLE equipment_new RENAME TO equipment")
+
+def create_indexes_and_view(conn):
+    for statement in INDEXES:
+        conn.execute(statement)
+    conn.execute(EQUIPMENT_VIEW)
+
+def setup_table_versions(conn):
+    conn.execute(TABLE_VERSIONS_SCHEMA)
+    for table in VERSIONED_TABLES:
+        conn.execute("INSERT OR IGNORE INTO table_versions (name) VALUES (?)", (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(TABLE_VERSION_TRIGGER.format(table=table, event=event, name=event.lower()))
+
+def setup_equipment_ids_version(conn):
+    conn.execute("INSERT OR IGNORE INTO table_versions (name) VALUES (?)", (EQUIPMENT_IDS_VERSION,))
+    for event in ("INSERT", "DELETE"):
+        conn.execute(EQUIPMENT_IDS_TRIGGER.format(event=event, name=event.lower()))
+
+def setup_import_progress(conn):
+    conn.execute(IMPORT_PROGRESS_SCHEMA)
+
+def setup_audit_log(conn):
+    """ Stvara audit_log; u novu tablicu prepisuje postojeće last_audit vrijednosti kao prvu povijest """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'audit_log'").fetchone()
+    conn.execute(AUDIT_LOG_SCHEMA)
+    if not exists:
+        conn.execute('''
+            INSERT OR IGNORE INTO audit_log (equipment_id, ts)
+            SELECT id, CAST(strftime('%s', last_audit) AS INTEGER) FROM equipment
+            WHERE strftime('%s', last_audit) IS NOT NULL
+        ''')
+    for statement in AUDIT_LOG_INDEXES:
+        conn.execute(statement)
+
+def clear_missing_assignees(conn):
+    """ Oslobađa opremu dodijeljenu djelatnicima kojih više nema
+
+    Do uključenog PRAGMA foreign_keys brisanje djelatnika nije diralo opremu, pa
+    takvi retci mogu postojati. Poslije njih više ne može biti.
+    """
+    conn.execute("UPDATE equipment SET assigned_employee_id = NULL "
+                 "WHERE assigned_employee_id IS NOT NULL AND assigned_employee_id NOT IN (SELECT id FROM employees)")
+
+# Applied in order, user_version is the number of steps already applied. Only append:
+# a step that has run somewhere must never change
+MIGRATIONS = (
+    create_tables,
+    migrate_employees_db,
+    migrate_assigned_to,
+    migrate_to_autoincrement,
+    create_indexes_and_view,
+    setup_fts,
+    setup_table_versions,
+    setup_audit_log,
+    clear_missing_assignees,
+    setup_change_log,
+    setup_equipment_ids_version,
+    setup_import_progress,
+)
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """ Primjenjuje migracije koje baza još nema; vraća broj primijenjenih """
+    if schema_version(conn) > len(MIGRATIONS):
+        raise RuntimeError(f"Baza ima shemu verzije {schema_version(conn)}, a ova verzija programa "
+                           f"poznaje samo do {len(MIGRATIONS)}")
+
+    applied = 0
+    while schema_version(conn) < len(MIGRATIONS):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Read again under the write lock: the app and the server may start at the same time
+            version = schema_version(conn)
+            if version >= len(MIGRATIONS):
+                break
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+        applied += 1
+    return applied
+
+# Database Setup
+def setup_databases(path=INVENTORY_DB):
+    """ Dovodi shemu na zadnju verziju; za već ažurnu bazu je to jedno čitanje user_version """
+    with connection(path) as conn:
+        return migrate(conn)
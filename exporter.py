@@ -0,0 +1,192 @@
+""" Izvoz opreme u .xlsx, .csv ili .parquet bez učitavanja cijele tablice u memoriju
+
+Retci se čitaju iz baze u komadima (stranice po id-u) i odmah pišu u datoteku, pa
+potrošnja memorije ne ovisi o veličini inventara. Izvoz prati istu pretragu i
+kategoriju kao i tablica u aplikaciji.
+
+    python exporter.py izvjestaj.xlsx
+    python exporter.py monitori.csv --category Monitor
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+
+import db
+from fts import equipment_page_query, fts_query
+
+BATCH_SIZE = 5000
+COLUMNS = ["id", "name", "category", "assigned_to", "last_audit"]
+FORMATS = ("xlsx", "csv", "parquet")
+
+def iter_batches(search_text="", category=None, batch_size=BATCH_SIZE):
+    """ Vraća retke opreme u komadima od najviše batch_size redaka """
+    after_id = -1
+    while True:
+        query, params = equipment_page_query(search_text, category, after_id, batch_size)
+        with db.connection() as conn:
+            rows = db.fetch_all(conn, "export", query, params)
+        if not rows:
+            return
+
+        yield [row[:len(COLUMNS)] for row in rows]
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1][0]
+
+def count_query(search_text="", category=None):
+    """ Upit za broj redaka koje će izvoz zapisati, uz istu pretragu i kategoriju """
+    match = fts_query(search_text)
+    if match is not None:
+        query = "SELECT COUNT(*) FROM equipment_fts JOIN equipment ON equipment.id = equipment_fts.rowid WHERE equipment_fts MATCH ?"
+        params = [match]
+        if category:
+            query += " AND +equipment.category = ?"  # the MATCH drives, see fts.search_query
+            params.append(category)
+    else:
+        query = "SELECT COUNT(*) FROM equipment"
+        params = []
+        if category:
+            query += " WHERE category = ?"
+            params.append(category)
+    return query, params
+
+def count_equipment(search_text="", category=None):
+    with db.connection() as conn:
+        return conn.execute(*count_query(search_text, category)).fetchone()[0]
+
+def format_for(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if extension not in FORMATS:
+        raise ValueError(f"Nepodržan format '{extension}', podržani su: {', '.join(FORMATS)}")
+    return extension
+
+# Writers: each takes an open binary file and an iterable of row batches
+def write_csv(f, batches, on_batch):
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text)
+    writer.writerow(COLUMNS)
+    for batch in batches:
+        writer.writerows(batch)
+        on_batch(len(batch))
+    text.flush()
+    text.detach()
+
+def write_xlsx(f, batches, on_batch):
+    from openpyxl import Workbook
+
+    # Write-only mode streams rows to the file instead of keeping cell objects around
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Oprema")
+    sheet.append(COLUMNS)
+    for batch in batches:
+        for row in batch:
+            sheet.append(row)
+        on_batch(len(batch))
+    workbook.save(f)
+
+def write_parquet(f, batches, on_batch):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Izvoz u Parquet zahtijeva paket pyarrow")
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("name", pa.string()),
+        ("category", pa.string()),
+        ("assigned_to", pa.string()),
+        ("last_audit", pa.string()),
+    ])
+
+    # One row group per batch
+    with pq.ParquetWriter(f, schema) as writer:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays([pa.array(c) for c in columns], schema=schema))
+            on_batch(len(batch))
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx, "parquet": write_parquet}
+
+class ExportCancelled(Exception):
+    pass
+
+def write_equipment(f, file_format, search_text="", category=None, batch_size=BATCH_SIZE, progress=None, cancelled=None):
+    """ Piše opremu u otvorenu binarnu datoteku u zadanom formatu i vraća broj redaka
+
+    progress(rows_written) se zove nakon svakog komada. Ako cancelled() vrati True,
+    baca ExportCancelled.
+    """
+    written = 0
+
+    def on_batch(count):
+        nonlocal written
+        written += count
+        if progress:
+            progress(written)
+        if cancelled and cancelled():
+            raise ExportCancelled
+
+    WRITERS[file_format](f, iter_batches(search_text, category, batch_size), on_batch)
+    return written
+
+def export_equipment(path, search_text="", category=None, batch_size=BATCH_SIZE, progress=None, cancelled=None):
+    """ Izvozi opremu u datoteku; format se određuje po ekstenziji
+
+    Vraća broj izvezenih redaka ili None ako je izvoz prekinut, a tada se
+    djelomična datoteka briše.
+    """
+    file_format = format_for(path)
+
+    # Written next to the target and renamed at the end, so a failed export never
+    # leaves a truncated report under the real name
+    partial = path + ".part"
+    try:
+        with open(partial, "wb") as f:
+            written = write_equipment(f, file_format, search_text, category, batch_size, progress, cancelled)
+        os.replace(partial, path)
+    except ExportCancelled:
+        return None
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    return written
+
+def iter_csv(search_text="", category=None, batch_size=BATCH_SIZE):
+    """ CSV kao niz komada teksta, za streaming HTTP odgovor """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write("\ufeff")  # BOM, so Excel opens UTF-8 correctly
+    writer.writerow(COLUMNS)
+    for batch in iter_batches(search_text, category, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="odredišna datoteka (.xlsx, .csv ili .parquet)")
+    parser.add_argument("-q", "--search", default="", help="tekst pretrage, kao u aplikaciji")
+    parser.add_argument("--category")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    total = count_equipment(args.search, args.category)
+
+    def report(written):
+        print(f"\r{written}/{total} redaka", end="", file=sys.stderr, flush=True)
+
+    written = export_equipment(args.path, args.search, args.category, args.batch_size, progress=report)
+    print(file=sys.stderr)
+    print(f"Izvezeno {written} redaka u '{args.path}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import re
+import sqlite3
+from contextlib import contextmanager
+
+# Full-text index over equipment and the name of its assignee, kept in sync by triggers.
+# The index stores its own copy of the text, so a row can be removed by rowid alone,
+# without knowing what the assignee was called before a rename or delete.
+FTS_TABLE = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS equipment_fts USING fts5(
+        name, category, assigned_to,
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    );
+'''
+
+FTS_INSERT_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS equipment_fts_insert AFTER INSERT ON equipment BEGIN
+        INSERT INTO equipment_fts (rowid, name, category, assigned_to)
+        SELECT id, name, category, assigned_to FROM equipment_view WHERE id = new.id;
+    END;
+'''
+
+FTS_TRIGGERS = FTS_INSERT_TRIGGER + '''
+
+    CREATE TRIGGER IF NOT EXISTS equipment_fts_delete AFTER DELETE ON equipment BEGIN
+        DELETE FROM equipment_fts WHERE rowid = old.id;
+    END;
+
+    -- last_audit is not indexed, so audits never touch the FTS table
+    CREATE TRIGGER IF NOT EXISTS equipment_fts_update
+    AFTER UPDATE OF id, name, category, assigned_employee_id ON equipment BEGIN
+        DELETE FROM equipment_fts WHERE rowid = old.id;
+        INSERT INTO equipment_fts (rowid, name, category, assigned_to)
+        SELECT id, name, category, assigned_to FROM equipment_view WHERE id = new.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS employees_fts_update
+    AFTER UPDATE OF first_name, last_name, company ON employees BEGIN
+        DELETE FROM equipment_fts WHERE rowid IN (SELECT id FROM equipment WHERE assigned_employee_id = new.id);
+        INSERT INTO equipment_fts (rowid, name, category, assigned_to)
+        SELECT id, name, category, assigned_to FROM equipment_view WHERE assigned_employee_id = new.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS employees_fts_delete AFTER DELETE ON employees BEGIN
+        DELETE FROM equipment_fts WHERE rowid IN (SELECT id FROM equipment WHERE assigned_employee_id = old.id);
+        INSERT INTO equipment_fts (rowid, name, category, assigned_to)
+        SELECT id, name, category, assigned_to FROM equipment_view WHERE assigned_employee_id = old.id;
+    END;
+'''
+
+FTS_OBJECTS = (
+    "equipment_fts_insert", "equipment_fts_delete", "equipment_fts_update",
+    "employees_fts_update", "employees_fts_delete",
+)
+
+def _statements(script):
+    # Split on complete statements only, trigger bodies have their own semicolons
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ""
+
+def setup_fts(conn):
+    """ Kreira FTS indeks i triggere ako ne postoje; novi indeks puni postojećim podacima
+
+    Radi unutar transakcije pozivatelja (migracije), zato ne koristi executescript koji bi je potvrdio.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'equipment_fts'").fetchone()
+    rebuild = "" if exists else '''
+        INSERT INTO equipment_fts (rowid, name, category, assigned_to)
+        SELECT id, name, category, assigned_to FROM equipment_view;
+    '''
+
+    # Triggers are dropped together with the equipment table, e.g. by a table rebuild
+    for statement in _statements(FTS_TABLE + FTS_TRIGGERS + rebuild):
+        conn.execute(statement)
+
+def drop_fts(conn):
+    """ Briše FTS indeks i triggere; setup_fts ih kasnije kreira i puni ispočetka """
+    for trigger in FTS_OBJECTS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS equipment_fts")
+
+@contextmanager
+def bulk_insert(conn):
+    """ Za uvoz velikog broja redaka u jednoj transakciji
+
+    Umjesto triggera po retku, FTS se puni jednim INSERT ... SELECT na kraju bloka.
+    U blok se predaje lista u koju pozivatelj dodaje id-eve upisane opreme. Ako blok
+    pukne, rollback transakcije vraća i trigger.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    conn.execute("DROP TRIGGER IF EXISTS equipment_fts_insert")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS fts_pending (id INTEGER PRIMARY KEY)")
+
+    pending = []
+    yield pending
+
+    conn.executemany("INSERT OR IGNORE INTO temp.fts_pending (id) VALUES (?)", ((i,) for i in pending))
+    conn.execute('''
+        INSERT INTO equipment_fts (rowid, name, category, assigned_to)
+        SELECT id, name, category, assigned_to FROM equipment_view
+        WHERE id IN (SELECT id FROM temp.fts_pending)
+    ''')
+    conn.execute("DELETE FROM temp.fts_pending")
+    conn.execute(FTS_INSERT_TRIGGER)
+
+def fts_query(text):
+    """ Pretvara korisnički unos u FTS5 upit: svaka riječ je prefiks i sve moraju biti pronađene """
+    tokens = re.findall(r"\w+", text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def search_query(text, category=None, after_id=-1, limit=100, ranked=False, filters=()):
+    """ Gradi upit za pretragu opreme po nazivu, kategoriji i djelatniku
+
+    Bez rangiranja rezultati idu po id-u pa se mogu listati stranicama (after_id),
+    što ostaje brzo i za vrlo česte prefikse. Rangirani upit (bm25) mora ocijeniti
+    sve pogotke, pa vraća samo prvih `limit` rezultata. filters su dodatni uvjeti
+    (sql, parametri) nad stupcima equipment_view.
+    """
+    match = fts_query(text)
+    if match is None:
+        return None
+
+    query = '''
+        SELECT equipment_view.id, equipment_view.name, equipment_view.category, equipment_view.assigned_to,
+               equipment_view.last_audit, equipment_view.assigned_employee_id
+        FROM equipment_fts JOIN equipment_view ON equipment_view.id = equipment_fts.rowid
+        WHERE equipment_fts MATCH ?
+    '''
+    params = [match]
+
+    # Unary + keeps idx_equipment_category out of a search: the MATCH has to drive the
+    # query, not one FTS lookup per item of the category
+    if category:
+        query += " AND +equipment_view.category = ?"
+        params.append(category)
+
+    for condition, condition_params in filters:
+        query += f" AND {condition}"
+        params.extend(condition_params)
+
+    if ranked:
+        query += " ORDER BY equipment_fts.rank LIMIT ?"
+    else:
+        query += " AND equipment_fts.rowid > ? ORDER BY equipment_fts.rowid LIMIT ?"
+        params.append(after_id)
+    params.append(limit)
+
+    return query, params
+
+def equipment_page_query(text, category=None, after_id=-1, limit=100, filters=()):
+    """ Jedna stranica opreme po id-u, s pretragom ako je zadan tekst, inače samo po kategoriji """
+    built = search_query(text, category, after_id, limit, filters=filters)
+    if built is not None:
+        return built
+
+    query = ("SELECT id, name, category, assigned_to, last_audit, assigned_employee_id "
+             "FROM equipment_view WHERE id > ?")
+    params = [after_id]
+
+    if category:
+        query += " AND category = ?"
+        params.append(category)
+
+    for condition, condition_params in filters:
+        query += f" AND {condition}"
+        params.extend(condition_params)
+
+    query += " ORDER BY id LIMIT ?"
+    params.append(limit)
+    return query, params
+
+def search_equipment(cursor, text, category=None, after_id=-1, limit=100, ranked=False, filters=()):
+    built = search_query(text, category, after_id, limit, ranked, filters)
+    if built is None:
+        return []
+
+    cursor.execute(*built)
+    return cursor.fetchall()
@@ -0,0 +1,309 @@
+""" Uvoz opreme i djelatnika iz .xlsx ili .csv datoteke
+
+Datoteka se čita u komadima i svaki komad se upisuje u jednoj transakciji, zajedno
+s brojem obrađenih redaka. Ako uvoz pukne ili se prekine, ponovno pokretanje za istu
+datoteku nastavlja od zadnjeg upisanog komada.
+
+    python importer.py oprema.xlsx
+    python importer.py djelatnici.csv --kind employees
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import db
+from fts import bulk_insert
+from labels import QR_DIR, submit_labels, update_manifest
+
+CHUNK_SIZE = 5000
+
+# Column names as exported, plus the headers shown in the app
+HEADER_ALIASES = {
+    "naziv": "name",
+    "kategorija": "category",
+    "dodijeljeno": "assigned_to",
+    "ime": "first_name",
+    "prezime": "last_name",
+    "tvrtka": "company",
+}
+
+REQUIRED_FIELDS = {
+    "equipment": ("name", "category"),
+    "employees": ("first_name", "last_name", "company"),
+}
+
+def iter_rows(path):
+    """ Vraća retke datoteke jedan po jedan, prvi redak je zaglavlje """
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            yield from csv.reader(f, dialect)
+    else:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+def count_rows(path):
+    """ Procjena broja redaka za prikaz napretka, None ako nije poznat """
+    if path.lower().endswith(".csv"):
+        with open(path, "rb") as f:
+            lines = sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+        return max(lines - 1, 0)
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+    finally:
+        workbook.close()
+    return max_row - 1 if max_row else None
+
+def normalize_header(header):
+    columns = []
+    for name in header:
+        name = str(name or "").strip().lower().replace(" ", "_")
+        columns.append(HEADER_ALIASES.get(name, name))
+    return columns
+
+def detect_kind(columns):
+    return "employees" if "first_name" in columns else "equipment"
+
+def source_key(path):
+    """ Ista datoteka (putanja, veličina, vrijeme izmjene) daje isti ključ za nastavak uvoza """
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+def _optional_id(value):
+    value = _text(value)
+    if not value:
+        return None
+    number = int(float(value))
+    if number <= 0:
+        raise ValueError
+    return number
+
+def validate_equipment(record, employees):
+    """ Vraća (id, name, category, assigned_employee_id) ili baca ValueError s opisom greške """
+    try:
+        equipment_id = _optional_id(record.get("id"))
+    except ValueError:
+        raise ValueError(f"neispravan id '{record.get('id')}'")
+
+    name = _text(record.get("name"))
+    category = _text(record.get("category"))
+    if not name or not category:
+        raise ValueError("naziv i kategorija su obavezni")
+
+    employee_id = None
+    raw_employee_id = _text(record.get("assigned_employee_id"))
+    assigned_to = _text(record.get("assigned_to"))
+    if raw_employee_id:
+        try:
+            employee_id = _optional_id(raw_employee_id)
+        except ValueError:
+            employee_id = None
+        if employee_id not in employees["ids"]:
+            raise ValueError(f"nepoznat djelatnik id '{raw_employee_id}'")
+    elif assigned_to and assigned_to != "Slobodno":
+        employee_id = employees["by_name"].get(assigned_to)
+        if employee_id is None:
+            raise ValueError(f"nepoznat djelatnik '{assigned_to}'")
+
+    return equipment_id, name, category, employee_id
+
+def validate_employee(record):
+    """ Vraća (id, first_name, last_name, company) ili baca ValueError s opisom greške """
+    try:
+        employee_id = _optional_id(record.get("id"))
+    except ValueError:
+        raise ValueError(f"neispravan id '{record.get('id')}'")
+
+    first_name = _text(record.get("first_name"))
+    last_name = _text(record.get("last_name"))
+    company = _text(record.get("company"))
+    if not first_name or not last_name or not company:
+        raise ValueError("ime, prezime i tvrtka su obavezni")
+
+    return employee_id, first_name, last_name, company
+
+def load_employees(conn):
+    """ Djelatnici po id-u i po imenu kako ga prikazuje aplikacija, "Ime Prezime (Tvrtka)" """
+    rows = conn.execute("SELECT id, first_name, last_name, company FROM employees").fetchall()
+    return {
+        "ids": {row[0] for row in rows},
+        "by_name": {f"{first} {last} ({company})": employee_id for employee_id, first, last, company in rows},
+    }
+
+def write_chunk(conn, kind, rows, line_numbers, errors):
+    """ Upisuje valjane retke jednog komada; vraća id-eve upisanih redaka """
+    table = "equipment" if kind == "equipment" else "employees"
+
+    # Rows that bring their own id (e.g. already printed labels) must not collide
+    explicit = [row[0] for row in rows if row[0] is not None]
+    taken = set()
+    for i in range(0, len(explicit), 500):
+        batch = explicit[i:i + 500]
+        placeholders = ", ".join("?" * len(batch))
+        taken.update(r[0] for r in conn.execute(f"SELECT id FROM {table} WHERE id IN ({placeholders})", batch))
+
+    accepted = []
+    seen = set()
+    for row, line in zip(rows, line_numbers):
+        if row[0] is not None and (row[0] in taken or row[0] in seen):
+            errors.append((line, f"id {row[0]} već postoji"))
+            continue
+        seen.add(row[0])
+        accepted.append(row)
+
+    # Reserved above the chunk's own ids too, they are inserted together with the reserved ones
+    missing = sum(1 for row in accepted if row[0] is None)
+    own_ids = max((row[0] for row in accepted if row[0] is not None), default=0)
+    next_id = db.reserve_ids(conn, table, missing, own_ids) if missing else None
+
+    final = []
+    for row in accepted:
+        if row[0] is None:
+            row = (next_id,) + row[1:]
+            next_id += 1
+        final.append(row)
+
+    if kind == "equipment":
+        with bulk_insert(conn) as indexed:
+            conn.executemany("INSERT INTO equipment (id, name, category, assigned_employee_id) VALUES (?, ?, ?, ?)", final)
+            indexed.extend(row[0] for row in final)
+    else:
+        conn.executemany("INSERT INTO employees (id, first_name, last_name, company) VALUES (?, ?, ?, ?)", final)
+
+    return [row[0] for row in final]
+
+def import_file(path, kind=None, chunk_size=CHUNK_SIZE, qr_dir=QR_DIR, generate_qr=True,
+                restart=False, progress=None, cancelled=None):
+    """ Uvozi datoteku i vraća sažetak: broj uvezenih redaka, greške po retku i je li uvoz dovršen
+
+    progress(rows_done) se zove nakon svakog upisanog komada; ako cancelled() vrati
+    True, uvoz staje nakon trenutnog komada i kasnije se može nastaviti.
+    """
+    rows = iter_rows(path)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Datoteka je prazna")
+
+    columns = normalize_header(header)
+    kind = kind or detect_kind(columns)
+    missing_columns = [name for name in REQUIRED_FIELDS[kind] if name not in columns]
+    if missing_columns:
+        raise ValueError(f"Nedostaju stupci: {', '.join(missing_columns)}")
+
+    key = source_key(path)
+    with db.transaction() as conn:
+        if restart:
+            conn.execute("DELETE FROM import_progress WHERE source = ?", (key,))
+        done = conn.execute("SELECT rows_done FROM import_progress WHERE source = ?", (key,)).fetchone()
+        employees = load_employees(conn) if kind == "equipment" else None
+
+    resumed_from = done[0] if done else 0
+    summary = {"kind": kind, "imported": 0, "errors": [], "resumed_from": resumed_from, "completed": False}
+
+    executor = ProcessPoolExecutor() if generate_qr and kind == "equipment" else None
+    qr_jobs = []
+    rows_done = 0
+    try:
+        chunk, line_numbers = [], []
+        # Line numbers as seen in a spreadsheet, the header is line 1
+        for line, values in enumerate(rows, start=2):
+            rows_done += 1
+            if rows_done <= resumed_from:
+                continue
+
+            record = dict(zip(columns, values))
+            try:
+                if kind == "equipment":
+                    chunk.append(validate_equipment(record, employees))
+                else:
+                    chunk.append(validate_employee(record))
+                line_numbers.append(line)
+            except ValueError as e:
+                summary["errors"].append((line, str(e)))
+
+            if (rows_done - resumed_from) % chunk_size == 0:
+                summary["imported"] += _commit_chunk(kind, key, chunk, line_numbers, rows_done, summary, executor, qr_dir, qr_jobs)
+                chunk, line_numbers = [], []
+                if progress:
+                    progress(rows_done)
+                if cancelled and cancelled():
+                    return summary
+
+        summary["imported"] += _commit_chunk(kind, key, chunk, line_numbers, rows_done, summary, executor, qr_dir, qr_jobs)
+        if progress:
+            progress(rows_done)
+
+        with db.transaction() as conn:
+            conn.execute("DELETE FROM import_progress WHERE source = ?", (key,))
+        summary["completed"] = True
+    finally:
+        if executor is not None:
+            wait(qr_jobs)
+            executor.shutdown()
+            for job in qr_jobs:
+                if job.exception() is None:
+                    update_manifest(job.result(), qr_dir)
+
+    return summary
+
+def _commit_chunk(kind, key, chunk, line_numbers, rows_done, summary, executor, qr_dir, qr_jobs):
+    with db.transaction() as conn:
+        ids = write_chunk(conn, kind, chunk, line_numbers, summary["errors"]) if chunk else []
+        conn.execute("INSERT OR REPLACE INTO import_progress (source, rows_done) VALUES (?, ?)", (key, rows_done))
+
+    # Labels render in other processes while the next chunk is read
+    if executor is not None and ids:
+        qr_jobs.extend(submit_labels(executor, ids, qr_dir))
+    return len(ids)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help=".xlsx ili .csv datoteka")
+    parser.add_argument("--kind", choices=("equipment", "employees"), help="zadano: prema zaglavlju datoteke")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--qr-dir", default=QR_DIR)
+    parser.add_argument("--no-qr", action="store_true", help="ne generiraj QR kodove")
+    parser.add_argument("--restart", action="store_true", help="zanemari prethodni prekinuti uvoz iste datoteke")
+    args = parser.parse_args()
+
+    db.setup_databases()
+    total = count_rows(args.path)
+
+    def report(rows_done):
+        print(f"\r{rows_done}/{total if total is not None else '?'} redaka", end="", file=sys.stderr, flush=True)
+
+    summary = import_file(args.path, kind=args.kind, chunk_size=args.chunk_size, qr_dir=args.qr_dir,
+                          generate_qr=not args.no_qr, restart=args.restart, progress=report)
+    print(file=sys.stderr)
+
+    if summary["resumed_from"]:
+        print(f"Nastavljeno od retka {summary['resumed_from'] + 1}")
+    print(f"Uvezeno: {summary['imported']}, grešaka: {len(summary['errors'])}")
+    for line, message in summary["errors"][:50]:
+        print(f"  redak {line}: {message}")
+
+    return 0 if summary["completed"] and not summary["errors"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
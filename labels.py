@@ -0,0 +1,305 @@
+""" QR naljepnice za opremu: generiranje PNG-ova i listovi za ispis
+
+QR kodovi se generiraju paralelno u više procesa. Za svaki id se u manifest.json
+pamti hash onoga što je na naljepnici, pa ponovno generiranje preskače naljepnice
+koje su već ažurne. Manji upisi se dodaju na kraj manifest.log, a manifest.json se
+ponovno piše tek kad log naraste.
+
+    python labels.py regenerate                  # cijeli inventar
+    python labels.py regenerate --ids 12 13 14 --force
+    python labels.py sheet naljepnice.pdf --category Monitor
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import db
+import metrics
+from exporter import iter_batches
+
+# qrcode and PIL are imported by the functions that draw: the desktop app imports this
+# module at startup and should not pay for them before the first label
+
+QR_DIR = "qr_codes"
+MANIFEST = "manifest.json"
+MANIFEST_LOG = "manifest.log"
+# Updates with fewer entries are appended to the log; a log this big is folded into the manifest
+MANIFEST_LOG_ENTRIES = 1000
+MANIFEST_LOG_BYTES = 1 << 20
+CHUNK_SIZE = 200
+
+# Everything that changes how a label looks; bump LABEL_VERSION when the drawing code changes
+LABEL_VERSION = 1
+QR_SETTINGS = {"version": 1, "box_size": 10, "border": 4}
+
+# A4 at 300 dpi, 3 x 8 labels per sheet
+PAGE_SIZE = (2480, 3508)
+PAGE_MARGIN = 90
+SHEET_COLUMNS = 3
+SHEET_ROWS = 8
+
+_manifest_lock = threading.Lock()
+
+# Labels rendered in the process pool are timed there, only the count reaches this process
+QR_RENDER_SECONDS = metrics.Histogram("inventory_qr_render_seconds", "Crtanje i spremanje jednog QR koda")
+LABELS_RENDERED = metrics.Counter("inventory_qr_labels_total", "Generirane QR naljepnice")
+
+def qr_path(equipment_id, directory=QR_DIR):
+    return os.path.join(directory, f"equipment_{equipment_id}.png")
+
+def label_hash(equipment_id):
+    content = json.dumps([LABEL_VERSION, str(equipment_id), QR_SETTINGS], sort_keys=True)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+def make_qr_image(equipment_id, box_size=QR_SETTINGS["box_size"]):
+    import qrcode
+    import qrcode.constants
+
+    qr = qrcode.QRCode(
+        version=QR_SETTINGS["version"],
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=QR_SETTINGS["border"],
+    )
+    qr.add_data(str(equipment_id))
+    qr.make(fit=True)
+
+    return qr.make_image(fill='black', back_color='white')
+
+# Generate QR Code
+def generate_qr_code(equipment_id, file_name):
+    with QR_RENDER_SECONDS.time():
+        make_qr_image(equipment_id).save(file_name)
+
+# Manifest of generated labels: {"<id>": "<label hash>"}, plus the entries appended since
+def load_manifest(directory=QR_DIR):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    try:
+        with open(os.path.join(directory, MANIFEST_LOG), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    manifest.update(json.loads(line))
+                except ValueError:
+                    break  # torn last line from a crash in the middle of a write
+    except OSError:
+        pass
+    return manifest
+
+def update_manifest(entries, directory=QR_DIR):
+    """ Dodaje generirane naljepnice u manifest
+
+    Jedna naljepnica (ili manji komad) je jedan redak na kraju manifest.log.
+    Veći upis ili prevelik log se spajaju u manifest.json, koji se zamjenjuje
+    atomarno. Ako proces stane između zamjene i brisanja loga, stariji zapisi iz
+    loga mogu neku naljepnicu označiti zastarjelom, pa se ona samo ponovno generira.
+    """
+    if not entries:
+        return
+
+    with _manifest_lock:
+        log_path = os.path.join(directory, MANIFEST_LOG)
+        log_size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        if len(entries) < MANIFEST_LOG_ENTRIES and log_size < MANIFEST_LOG_BYTES:
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entries) + "\n")
+            return
+
+        manifest = load_manifest(directory)
+        manifest.update(entries)
+
+        path = os.path.join(directory, MANIFEST)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+        if log_size:
+            os.remove(log_path)
+
+def stale_ids(equipment_ids, directory=QR_DIR):
+    """ Id-evi čija naljepnica ne postoji ili ne odgovara trenutnim postavkama """
+    manifest = load_manifest(directory)
+    return [
+        equipment_id for equipment_id in equipment_ids
+        if manifest.get(str(equipment_id)) != label_hash(equipment_id)
+        or not os.path.exists(qr_path(equipment_id, directory))
+    ]
+
+def _render_chunk(equipment_ids, directory):
+    entries = {}
+    for equipment_id in equipment_ids:
+        generate_qr_code(equipment_id, qr_path(equipment_id, directory))
+        entries[str(equipment_id)] = label_hash(equipment_id)
+    return entries
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def submit_labels(executor, equipment_ids, directory=QR_DIR, chunk_size=CHUNK_SIZE):
+    """ Šalje generiranje u zadani pool procesa; rezultat svakog futurea ide u update_manifest """
+    os.makedirs(directory, exist_ok=True)
+    return [executor.submit(_render_chunk, chunk, directory) for chunk in _chunks(list(equipment_ids), chunk_size)]
+
+def regenerate_labels(equipment_ids, directory=QR_DIR, force=False, chunk_size=CHUNK_SIZE, progress=None):
+    """ Generira naljepnice koje nisu ažurne i vraća (generirano, preskočeno)
+
+    Manje od jednog komada posla se generira u ovom procesu, veći skupovi u poolu
+    procesa preko svih jezgri. progress(done, total) se zove nakon svakog komada.
+    """
+    os.makedirs(directory, exist_ok=True)
+    equipment_ids = list(equipment_ids)
+    todo = equipment_ids if force else stale_ids(equipment_ids, directory)
+    skipped = len(equipment_ids) - len(todo)
+
+    if len(todo) <= chunk_size:
+        update_manifest(_render_chunk(todo, directory), directory)
+        LABELS_RENDERED.inc(len(todo))
+        if progress:
+            progress(len(todo), len(todo))
+        return len(todo), skipped
+
+    done = 0
+    with ProcessPoolExecutor() as executor:
+        for future in as_completed(submit_labels(executor, todo, directory, chunk_size)):
+            entries = future.result()
+            update_manifest(entries, directory)
+            LABELS_RENDERED.inc(len(entries))
+            done += len(entries)
+            if progress:
+                progress(done, len(todo))
+
+    return done, skipped
+
+# Printable sheets
+def _font(size):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size)
+
+def render_sheet(labels, columns=SHEET_COLUMNS, rows=SHEET_ROWS):
+    """ Jedan list s naljepnicama; labels je lista (id, naziv) """
+    from PIL import Image, ImageDraw
+
+    page = Image.new("1", PAGE_SIZE, 1)
+    draw = ImageDraw.Draw(page)
+    cell_width = (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // columns
+    cell_height = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // rows
+    text_height = cell_height // 5
+    qr_size = min(cell_width, cell_height - text_height) - 20
+    id_font = _font(text_height // 2)
+    name_font = _font(text_height // 3)
+
+    for index, (equipment_id, name) in enumerate(labels[:columns * rows]):
+        left = PAGE_MARGIN + (index % columns) * cell_width
+        top = PAGE_MARGIN + (index // columns) * cell_height
+
+        qr = make_qr_image(equipment_id).get_image().resize((qr_size, qr_size), Image.NEAREST)
+        page.paste(qr, (left + (cell_width - qr_size) // 2, top))
+
+        center = left + cell_width // 2
+        draw.text((center, top + qr_size), str(equipment_id), font=id_font, fill=0, anchor="mt")
+        draw.text((center, top + qr_size + text_height // 2), str(name)[:40], font=name_font, fill=0, anchor="mt")
+
+    return page
+
+def _render_sheet_png(labels, columns, rows):
+    buffer = io.BytesIO()
+    render_sheet(labels, columns, rows).save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+def write_label_sheets(path, labels, columns=SHEET_COLUMNS, rows=SHEET_ROWS, progress=None):
+    """ Slaže naljepnice na listove za ispis i vraća broj listova
+
+    .pdf daje jedan višestranični PDF, .png po jednu sliku za svaki list
+    (naljepnice_001.png, naljepnice_002.png, ...). Listovi se crtaju paralelno,
+    a upisuju redom kako stižu pa u memoriji nikad nije cijeli dokument.
+    Bez naljepnica ne upisuje ništa i vraća 0.
+    """
+    from PIL import Image
+
+    labels = list(labels)
+    if not labels:
+        return 0
+    pages = _chunks(labels, columns * rows)
+    as_pdf = path.lower().endswith(".pdf")
+    stem = os.path.splitext(path)[0]
+
+    with ProcessPoolExecutor() as executor:
+        rendered = executor.map(_render_sheet_png, pages, [columns] * len(pages), [rows] * len(pages))
+        for number, png in enumerate(rendered, start=1):
+            if as_pdf:
+                page = Image.open(io.BytesIO(png))
+                page.save(path, "PDF", resolution=300, append=number > 1)
+            else:
+                with open(f"{stem}_{number:03d}.png", "wb") as f:
+                    f.write(png)
+            if progress:
+                progress(number, len(pages))
+
+    return len(pages)
+
+def write_search_sheets(path, search_text="", category=None, progress=None):
+    """ Listovi naljepnica za svu opremu koja odgovara pretrazi; čitanje i crtanje zajedno, za pozadinski posao """
+    return write_label_sheets(path, load_labels(search_text=search_text, category=category), progress=progress)
+
+def load_labels(equipment_ids=None, search_text="", category=None):
+    """ (id, naziv) za zadane id-eve ili za svu opremu koja odgovara pretrazi """
+    if equipment_ids is None:
+        return [(row[0], row[1]) for batch in iter_batches(search_text, category) for row in batch]
+
+    labels = []
+    equipment_ids = list(equipment_ids)
+    with db.connection() as conn:
+        for chunk in _chunks(equipment_ids, 500):
+            placeholders = ", ".join("?" * len(chunk))
+            labels += conn.execute(f"SELECT id, name FROM equipment WHERE id IN ({placeholders}) ORDER BY id", chunk).fetchall()
+    return labels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    regenerate = commands.add_parser("regenerate", help="generiraj QR kodove koji nisu ažurni")
+    regenerate.add_argument("--ids", type=int, nargs="+", help="zadano: sva oprema")
+    regenerate.add_argument("--force", action="store_true", help="generiraj i ažurne naljepnice")
+    regenerate.add_argument("--dir", default=QR_DIR)
+
+    sheet = commands.add_parser("sheet", help="listovi naljepnica za ispis (.pdf ili .png)")
+    sheet.add_argument("path")
+    sheet.add_argument("--ids", type=int, nargs="+", help="zadano: sva oprema koja odgovara pretrazi")
+    sheet.add_argument("-q", "--search", default="")
+    sheet.add_argument("--category")
+    sheet.add_argument("--columns", type=int, default=SHEET_COLUMNS)
+    sheet.add_argument("--rows", type=int, default=SHEET_ROWS)
+    args = parser.parse_args()
+
+    def report(done, total):
+        print(f"\r{done}/{total}", end="", file=sys.stderr, flush=True)
+
+    if args.command == "regenerate":
+        ids = args.ids if args.ids else [label[0] for label in load_labels()]
+        generated, skipped = regenerate_labels(ids, args.dir, force=args.force, progress=report)
+        print(file=sys.stderr)
+        print(f"Generirano: {generated}, već ažurno: {skipped}")
+    else:
+        labels = load_labels(args.ids, args.search, args.category)
+        if not labels:
+            print("Nijedna oprema ne odgovara, ništa nije spremljeno")
+            return
+        pages = write_label_sheets(args.path, labels, args.columns, args.rows, progress=report)
+        print(file=sys.stderr)
+        print(f"{len(labels)} naljepnica na {pages} listova")
+
+if __name__ == "__main__":
+    main()
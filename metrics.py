@@ -0,0 +1,222 @@
+""" Brojači i histogrami trajanja za vruće putanje, s izvozom u Prometheus tekstualnom formatu
+
+Mjerenje je isključeno dok se ne postavi INVENTORY_METRICS=1 (ili enable()). Tada je
+svaka točka mjerenja jedna provjera zastavice i vraća zajednički prazni timer, pa
+isključeno mjerenje ne košta ništa mjerljivo.
+
+Radni procesi gunicorna imaju svaki svoje brojače. Kad je zadan zajednički direktorij
+(share()), svaki proces u njega povremeno zapisuje svoje stanje, a /metrics zbraja
+stanja svih procesa.
+"""
+import json
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("INVENTORY_METRICS", "").lower() in ("1", "true", "yes")
+FLUSH_SECONDS = 5
+
+# Seconds; from a single page lookup up to a full export
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = {}
+_share_dir = None
+
+def enable(enabled=True):
+    global ENABLED
+    ENABLED = enabled
+
+# Shared no-op returned by time() while metrics are off
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(labels): self._copy(value) for labels, value in self._values.items()}
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _label_text(self, labels, extra=()):
+        pairs = list(zip(self.label_names, labels)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, *labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    @staticmethod
+    def _merge(total, value):
+        return (total or 0) + value
+
+    def _lines(self, values):
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{self._label_text(labels)} {value}"
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+        self._last = {}
+
+    def observe(self, seconds, *labels):
+        if not ENABLED:
+            return
+        with self._lock:
+            # [count per bucket..., count, sum]
+            value = self._values.get(labels)
+            if value is None:
+                value = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    value[i] += 1
+                    break
+            value[-2] += 1
+            value[-1] += seconds
+            self._last[labels] = seconds
+
+    def time(self, *labels):
+        """ with HISTOGRAM.time("oznaka"): ... mjeri blok; dok je mjerenje isključeno ne radi ništa """
+        if not ENABLED:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def last(self, *labels):
+        """ Zadnje izmjereno trajanje u sekundama ili None """
+        return self._last.get(labels)
+
+    def reset(self):
+        super().reset()
+        self._last.clear()
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    @staticmethod
+    def _merge(total, value):
+        return value if total is None else [a + b for a, b in zip(total, value)]
+
+    def _lines(self, values):
+        for labels, value in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, value):
+                cumulative += count
+                yield f"{self.name}_bucket{self._label_text(labels, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_bucket{self._label_text(labels, [('le', '+Inf')])} {value[-2]}"
+            yield f"{self.name}_sum{self._label_text(labels)} {value[-1]}"
+            yield f"{self.name}_count{self._label_text(labels)} {value[-2]}"
+
+# Several processes: each writes its own snapshot, /metrics adds them up
+def share(directory):
+    """ Zajednički direktorij za stanja procesa; poziva se prije forka radnih procesa """
+    global _share_dir
+    os.makedirs(directory, exist_ok=True)
+    _share_dir = directory
+
+def _snapshot_path(pid):
+    return os.path.join(_share_dir, f"{pid}.json")
+
+def write_snapshot():
+    if _share_dir is None:
+        return
+    path = _snapshot_path(os.getpid())
+    with open(path + ".tmp", "w") as f:
+        json.dump({name: metric.snapshot() for name, metric in _registry.items()}, f)
+    os.replace(path + ".tmp", path)
+
+def start_process():
+    """ U novom radnom procesu: brojači kopirani od roditelja se brišu i kreće periodično zapisivanje """
+    for metric in _registry.values():
+        metric.reset()
+    if _share_dir is None:
+        return
+
+    def flush():
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            write_snapshot()
+
+    threading.Thread(target=flush, name="metrics-flush", daemon=True).start()
+
+def stop_process():
+    """ Proces izlazi: njegovo stanje ne ulazi više u zbroj """
+    if _share_dir is not None and os.path.exists(_snapshot_path(os.getpid())):
+        os.remove(_snapshot_path(os.getpid()))
+
+def _other_snapshots():
+    if _share_dir is None:
+        return []
+    own = f"{os.getpid()}.json"
+    snapshots = []
+    for file_name in os.listdir(_share_dir):
+        if file_name.endswith(".json") and file_name != own:
+            try:
+                with open(os.path.join(_share_dir, file_name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # the process is just rewriting or removing it
+    return snapshots
+
+def render():
+    """ Sve metrike u Prometheus tekstualnom formatu, zbrojene preko procesa """
+    others = _other_snapshots()
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        totals = {}
+        for snapshot in [metric.snapshot()] + [other.get(name, {}) for other in others]:
+            for key, value in snapshot.items():
+                labels = tuple(json.loads(key))
+                totals[labels] = metric._merge(totals.get(labels), value)
+
+        lines.append(f"# HELP {name} {metric.description}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric._lines(totals))
+    return "\n".join(lines) + "\n"
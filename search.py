@@ -0,0 +1,146 @@
+import sqlite3
+import time
+from collections import deque
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+import db
+import metrics
+
+DEBOUNCE_MS = 200
+CHUNK_SIZE = 50
+LATENCY_WINDOW = 200
+
+SEARCH_SECONDS = metrics.Histogram("inventory_search_seconds", "Od pokretanja pretrage do prve stranice u tablici")
+
+# Signals from worker threads, delivered on the GUI thread
+class SearchSignals(QObject):
+    rows_ready = pyqtSignal(int, list)         # generation, rows
+    page_done = pyqtSignal(int, bool, float)   # generation, has_more, seconds
+    page_failed = pyqtSignal(int, str)         # generation, error
+
+# One page of a search, run on the thread pool
+class SearchWorker(QRunnable):
+    def __init__(self, generation, query, params, page_size, signals):
+        super().__init__()
+        self.generation = generation
+        self.query = query
+        self.params = params
+        self.page_size = page_size
+        self.signals = signals
+        self.cancelled = False
+
+    def run(self):
+        try:
+            self._run()
+        except Exception as e:
+            # Without an answer for its page the model would wait for it for the rest of the session
+            if not self.cancelled:
+                self.signals.page_failed.emit(self.generation, str(e))
+
+    def _run(self):
+        start = time.perf_counter()
+        count = 0
+
+        with db.connection() as conn:
+            # Lets a newer search abort this query in the middle of a scan
+            conn.set_progress_handler(lambda: self.cancelled, 1000)
+            try:
+                cursor = conn.cursor()
+                with db.QUERY_SECONDS.time("search_page"):
+                    cursor.execute(self.query, self.params)
+                with db.FETCH_SECONDS.time("search_page"):
+                    while not self.cancelled:
+                        rows = cursor.fetchmany(CHUNK_SIZE)
+                        if not rows:
+                            break
+                        count += len(rows)
+                        self.signals.rows_ready.emit(self.generation, rows)
+                db.ROWS.inc(count, "search_page")
+            except sqlite3.OperationalError:
+                if not self.cancelled:
+                    raise
+            finally:
+                conn.set_progress_handler(None, 0)
+
+        if not self.cancelled:
+            self.signals.page_done.emit(self.generation, count == self.page_size, time.perf_counter() - start)
+
+# Debounced background search for the equipment table
+class SearchPipeline(QObject):
+    debounced = pyqtSignal()
+    search_finished = pyqtSignal(float)  # latency of the first page in seconds
+    search_failed = pyqtSignal(str)
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.pool = QThreadPool.globalInstance()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._worker = None
+        self._started_at = None
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(DEBOUNCE_MS)
+        self.timer.timeout.connect(self.debounced)
+
+        self.signals = SearchSignals()
+        self.signals.rows_ready.connect(self.model.append_rows)
+        self.signals.page_done.connect(self._page_done)
+        self.signals.page_failed.connect(self._page_failed)
+        self.model.page_requested.connect(self._fetch_page)
+
+    # Restart the debounce timer, the last call in a burst wins
+    def schedule(self, *_):
+        self.timer.start()
+
+    def search(self, search_text, category):
+        self.timer.stop()
+        self._cancel()
+        self._started_at = time.perf_counter()
+        self.model.set_filter(search_text, category)
+
+    def _cancel(self):
+        if self._worker is not None:
+            self._worker.cancelled = True
+            self._worker = None
+
+    def _fetch_page(self, generation, after_id):
+        self._cancel()
+        query, params = self.model.page_query(after_id)
+        self._worker = SearchWorker(generation, query, params, self.model.PAGE_SIZE, self.signals)
+        self.pool.start(self._worker)
+
+    def _page_done(self, generation, has_more, seconds):
+        if self._worker is not None and self._worker.generation == generation:
+            self._worker = None
+        self.model.finish_page(generation, has_more)
+
+        if generation == self.model.generation and self._started_at is not None:
+            latency = time.perf_counter() - self._started_at
+            self._started_at = None
+            self.latencies.append(latency)
+            SEARCH_SECONDS.observe(latency)
+            self.search_finished.emit(latency)
+
+    def _page_failed(self, generation, error):
+        if self._worker is not None and self._worker.generation == generation:
+            self._worker = None
+        # No more pages for this search, the next search starts over
+        self.model.finish_page(generation, False)
+        if generation == self.model.generation:
+            self._started_at = None
+            self.search_failed.emit(error)
+
+    def stats(self):
+        """ p50/p95 latencija zadnjih pretraga u milisekundama """
+        if not self.latencies:
+            return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0}
+
+        ordered = sorted(self.latencies)
+        return {
+            "count": len(ordered),
+            "p50_ms": ordered[len(ordered) // 2] * 1000,
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        }
@@ -1,80 +1,578 @@
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify, Response, send_file, g
 from flask_cors import CORS
-import  sqlite3
+import argparse
+import atexit
 import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import db
+import logs
+import audit
+import bulk
+import changes
+import metrics
+from audit import MAX_BATCH, apply_audits
+from exporter import FORMATS, iter_csv, write_equipment
+from fts import equipment_page_query, search_equipment
 
 app = Flask(__name__)
-CORS(app, resources={r"/audit": {"origins": "https://192.168.1.15:8080"}})
+CORS(app, resources={r"/audit.*": {"origins": "https://192.168.1.15:8080"}})
+
+logger = logging.getLogger("inventory.server")
+
+db.setup_databases()
+
+# Server configuration, environment variables with command line overrides (see main)
+HOST = os.environ.get("INVENTORY_HOST", "0.0.0.0")
+PORT = int(os.environ.get("INVENTORY_PORT", "5000"))
+WORKERS = int(os.environ.get("INVENTORY_WORKERS", str(2 * (os.cpu_count() or 1) + 1)))
+THREADS = int(os.environ.get("INVENTORY_THREADS", "4"))
+CERT_FILE = os.environ.get("INVENTORY_CERT", "localhost.pem")
+KEY_FILE = os.environ.get("INVENTORY_KEY", "localhost-key.pem")
+# "sync" writes each audit request before answering, "queued" acknowledges at once
+# and commits in groups (audit.AuditQueue); the journal mode decides what survives a crash
+AUDIT_MODE = os.environ.get("INVENTORY_AUDIT_MODE", "sync")
+AUDIT_JOURNAL = os.environ.get("INVENTORY_AUDIT_JOURNAL", "flush")
+
+_audit_queue = None
+_audit_queue_lock = threading.Lock()
+
+def audit_queue():
+    """ Red za audit ovog procesa; stvara se pri prvom zahtjevu, nakon forka radnog procesa """
+    global _audit_queue
+    with _audit_queue_lock:
+        if _audit_queue is None:
+            _audit_queue = audit.AuditQueue(journal_mode=AUDIT_JOURNAL)
+            atexit.register(_audit_queue.stop)
+        return _audit_queue
+
+def stop_audit_queue():
+    if _audit_queue is not None:
+        _audit_queue.stop()
+
+REQUEST_SECONDS = metrics.Histogram("inventory_http_request_seconds", "Obrada zahtjeva do zaglavlja odgovora",
+                                    ("route", "method"))
+REQUESTS = metrics.Counter("inventory_http_requests_total", "Odgovoreni zahtjevi", ("route", "method", "status"))
+JSON_SECONDS = metrics.Histogram("inventory_json_seconds", "Pretvaranje odgovora u JSON", ("endpoint",))
+
+@app.before_request
+def start_timer():
+    g.started_at = time.perf_counter()
+
+@app.after_request
+def log_request(response):
+    if metrics.ENABLED:
+        # Route pattern, not the path: /equipment?after_id=... is one series, not one per page
+        route = request.url_rule.rule if request.url_rule else "<nepoznata>"
+        REQUEST_SECONDS.observe(time.perf_counter() - g.get("started_at", time.perf_counter()), route, request.method)
+        REQUESTS.inc(1, route, request.method, str(response.status_code))
+
+    # Debug level, so the hot path doesn't format a line per request unless asked to
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("request", extra={
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "ms": round((time.perf_counter() - g.get("started_at", time.perf_counter())) * 1000, 2),
+        })
+    return response
 
 def json_utf8(data):
     """ Funkcija za vraćanje JSON-a s UTF-8 podrškom """
-    return Response(json.dumps(data, ensure_ascii=False, indent=4), mimetype='application/json; charset=utf-8')
+    with JSON_SECONDS.time(request.endpoint):
+        body = json.dumps(data, ensure_ascii=False, indent=4)
+    return Response(body, mimetype='application/json; charset=utf-8')
 
 @app.route('/audit', methods=['POST'])
 def audit_equipment():
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return json_utf8({"status": "error", "message": "Tijelo zahtjeva mora biti JSON objekt"}), 400
     equipment_id = data.get('equipment_id')
 
-    print("Primljen zahtjev za audit opreme:", equipment_id)  # Dodano
-
     if not equipment_id:
-        return jsonify(json.loads(json.dumps({"status": "error", "message": "Equipment ID je obavezan"}, ensure_ascii=False))), 400
-    
-    conn = sqlite3.connect('inventory.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM equipment WHERE id = ?", (equipment_id,))
-    if not cursor.fetchone():
-        conn.close()
-        return jsonify(json.loads(json.dumps({"status": "error", "message": "Oprema nije pronađena"}, ensure_ascii=False))), 404
-    
-    # Ažurirajte last_audit
-    cursor.execute("UPDATE equipment SET last_audit = datetime('now') WHERE id = ?", (equipment_id,))
-    conn.commit()
-    conn.close()
-
-    print("Oprema ažurirana:", equipment_id)  # Dodano
-    return jsonify(json.loads(json.dumps({"status": "success", "message": "Oprema ažurirana"}, ensure_ascii=False)))
-    
+        return json_utf8({"status": "error", "message": "Equipment ID je obavezan"}), 400
+
+    if AUDIT_MODE == "queued":
+        try:
+            result = audit_queue().submit([data])[0]
+        except audit.QueueFull:
+            return queue_full()
+    else:
+        with db.transaction() as conn:
+            result = apply_audits(conn, [data])[0]
+
+    if result["status"] == "not_found":
+        return json_utf8({"status": "error", "message": "Oprema nije pronađena"}), 404
+    if result["status"] == "invalid":
+        return json_utf8({"status": "error", "message": result["message"]}), 400
+    if result["status"] == "accepted":
+        return json_utf8({"status": "success", "message": "Sken primljen"}), 202
+    return json_utf8({"status": "success", "message": "Oprema ažurirana"})
+
+def queue_full():
+    # Backpressure: the client keeps the scans and retries later
+    response = json_utf8({"status": "error", "message": "Server je preopterećen, pokušajte ponovno"})
+    response.status_code = 503
+    response.headers['Retry-After'] = "1"
+    return response
+
+@app.route('/audit/batch', methods=['POST'])
+def audit_batch():
+    """ Više skenova odjednom: {"scans": [{"equipment_id": 1, "scanned_at": "2024-05-01T10:15:00Z"}, ...]}
+
+    Svi skenovi se upisuju u jednoj transakciji; odgovor ima rezultat za svaki sken istim redom.
+    """
+    data = request.get_json(silent=True)
+    scans = data.get('scans') if isinstance(data, dict) else data
+    if not isinstance(scans, list) or not scans:
+        return json_utf8({"status": "error", "message": "Polje scans mora biti neprazna lista"}), 400
+    if len(scans) > MAX_BATCH:
+        return json_utf8({"status": "error", "message": f"Najviše {MAX_BATCH} skenova po zahtjevu"}), 413
+
+    if AUDIT_MODE == "queued":
+        try:
+            results = audit_queue().submit(scans)
+        except audit.QueueFull:
+            return queue_full()
+    else:
+        with db.transaction() as conn:
+            results = apply_audits(conn, scans)
+    logger.debug("audit batch", extra={"scans": len(scans)})
+
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return json_utf8({"status": "success", "counts": counts, "results": results}), 202 if AUDIT_MODE == "queued" else 200
+
+@app.route('/audit/metrics', methods=['GET'])
+def audit_metrics():
+    """ Dubina reda i latencija grupnih upisa za ovaj radni proces (samo u načinu queued) """
+    if AUDIT_MODE != "queued":
+        return json_utf8({"mode": AUDIT_MODE})
+    return json_utf8(dict(audit_queue().metrics(), mode=AUDIT_MODE, pid=os.getpid()))
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """ Brojači i histogrami svih radnih procesa u Prometheus formatu; uz --metrics ili INVENTORY_METRICS=1 """
+    if not metrics.ENABLED:
+        return json_utf8({"status": "error", "message": "Metrike su isključene, pokrenite server s --metrics"}), 404
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# Bulk equipment changes, each one statement in one transaction
+BULK_ACTIONS = {
+    "assign": lambda conn, ids, data: bulk.assign(conn, ids, data.get('employee_id')),
+    "unassign": lambda conn, ids, data: bulk.assign(conn, ids, None),
+    "category": lambda conn, ids, data: bulk.set_category(conn, ids, data.get('category')),
+    "delete": lambda conn, ids, data: bulk.delete(conn, ids),
+}
+
+@app.route('/equipment/bulk', methods=['POST'])
+def bulk_equipment():
+    """ Ista izmjena za mnogo komada opreme: {"action": "assign", "ids": [1, 2, 3], "employee_id": 7}
+
+    Akcije: assign (employee_id), unassign, category (category), delete. Sve ili ništa:
+    nepoznat djelatnik ili prazna kategorija ne mijenjaju ništa. Id-evi koji ne
+    postoje vraćaju se u missing.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or data.get('action') not in BULK_ACTIONS:
+        return json_utf8({"status": "error", "message": f"action mora biti jedno od: {', '.join(BULK_ACTIONS)}"}), 400
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(type(i) is int for i in ids):
+        return json_utf8({"status": "error", "message": "Polje ids mora biti neprazna lista id-eva opreme"}), 400
+    if len(ids) > bulk.MAX_IDS:
+        return json_utf8({"status": "error", "message": f"Najviše {bulk.MAX_IDS} id-eva po zahtjevu"}), 413
+    if data['action'] == "assign" and type(data.get('employee_id')) is not int:
+        return json_utf8({"status": "error", "message": "employee_id je obavezan, za oslobađanje je action unassign"}), 400
+
+    try:
+        with db.transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            found = BULK_ACTIONS[data['action']](conn, ids, data)
+    except ValueError as e:
+        return json_utf8({"status": "error", "message": str(e)}), 400
+    logger.debug("bulk equipment", extra={"action": data['action'], "ids": len(ids), "found": len(found)})
+
+    found = set(found)
+    return json_utf8({"status": "success", "action": data['action'], "count": len(found),
+                      "missing": sorted(set(ids) - found)})
+
+# Listing endpoints
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+
+EQUIPMENT_FIELDS = ("id", "name", "category", "assigned_to", "last_audit", "assigned_employee_id")
+EMPLOYEE_FIELDS = ("id", "first_name", "last_name", "company")
+
+class BadRequest(Exception):
+    pass
+
+@app.errorhandler(BadRequest)
+def bad_request(e):
+    return json_utf8({"status": "error", "message": str(e)}), 400
+
+def etag_for(*tables):
+    """ ETag iz brojača izmjena tablica; isti dok se tablice ne promijene """
+    with db.connection() as conn:
+        versions = db.table_versions(conn)
+    return "-".join(f"{table}{versions.get(table, 0)}" for table in tables)
+
+def not_modified(etag):
+    return request.if_none_match.contains_weak(etag)
+
+def selected_fields(all_fields):
+    """ ?fields=id,name -> indeksi i imena traženih stupaca """
+    requested = request.args.get('fields')
+    if not requested:
+        return list(range(len(all_fields))), list(all_fields)
+
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in all_fields]
+    if unknown:
+        raise BadRequest(f"Nepoznata polja: {', '.join(unknown)}")
+    return [all_fields.index(name) for name in names], names
+
+def int_arg(name, default=None):
+    """ Cjelobrojni parametar upita; neispravna vrijednost je 400, a ne tiho zadana vrijednost """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest(f"{name} mora biti cijeli broj") from None
+
+def page_limit():
+    """ ?limit=N za jednu stranicu, None za cijeli popis """
+    limit = int_arg('limit')
+    if limit is None:
+        return None
+    if limit < 1:
+        raise BadRequest("limit mora biti pozitivan")
+    return min(limit, MAX_PAGE_SIZE)
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def listing_response(page, etag, indexes, names):
+    """ Jedna stranica kao JSON lista; sljedeća stranica ide s ?after_id=<X-Next-After-Id> """
+    rows, has_more = page
+    response = json_utf8([dict(zip(names, (row[i] for i in indexes))) for row in rows])
+    if has_more:
+        response.headers['X-Next-After-Id'] = str(rows[-1][0])
+    response.set_etag(etag, weak=True)
+    return response
+
+def stream_response(pages, etag, indexes, names):
+    """ Cijeli popis, šalje se u komadima kako se čita iz baze (NDJSON ili JSON lista) """
+    ndjson = wants_ndjson()
+    # The body is generated after the view returns, outside the request context
+    endpoint = request.endpoint
+
+    def generate():
+        first = True
+        if not ndjson:
+            yield "["
+        for rows in pages:
+            # One chunk per page from the database, encoded before it is handed to the socket
+            with JSON_SECONDS.time(endpoint):
+                items = [json.dumps(dict(zip(names, (row[i] for i in indexes))), ensure_ascii=False) for row in rows]
+                if ndjson:
+                    chunk = "\n".join(items) + "\n"
+                else:
+                    chunk = ("" if first else ",") + ",".join(items)
+            first = False
+            yield chunk
+        if not ndjson:
+            yield "]"
+
+    mimetype = 'application/x-ndjson; charset=utf-8' if ndjson else 'application/json; charset=utf-8'
+    response = Response(generate(), mimetype=mimetype)
+    response.set_etag(etag, weak=True)
+    return response
+
+def iter_pages(page_query, after_id, name):
+    """ Stranice po id-u do kraja tablice; page_query(after_id, limit) -> (upit, parametri)
+
+    Čita se tek dok se odgovor šalje, izvan konteksta zahtjeva, pa ime za metrike
+    dolazi kao argument.
+    """
+    while True:
+        with db.connection() as conn:
+            rows = db.fetch_all(conn, name, *page_query(after_id, STREAM_BATCH_SIZE))
+        if rows:
+            yield rows
+        if len(rows) < STREAM_BATCH_SIZE:
+            return
+        after_id = rows[-1][0]
+
+def fetch_page(page_query, after_id, limit):
+    # One extra row tells whether there is a next page
+    with db.connection() as conn:
+        rows = db.fetch_all(conn, request.endpoint, *page_query(after_id, limit + 1))
+    return rows[:limit], len(rows) > limit
+
+def equipment_filters():
+    """ ?assigned=true|false|<id djelatnika> i ?audit_older_than=<dana> (uključuje nikad auditiranu opremu) """
+    filters = []
+
+    assigned = request.args.get('assigned')
+    if assigned in ('true', 'false'):
+        filters.append((f"equipment_view.assigned_employee_id IS {'NOT ' if assigned == 'true' else ''}NULL", []))
+    elif assigned:
+        if not assigned.isdigit():
+            raise BadRequest("assigned mora biti true, false ili id djelatnika")
+        filters.append(("equipment_view.assigned_employee_id = ?", [int(assigned)]))
+
+    days = request.args.get('audit_older_than')
+    if days:
+        if not days.isdigit():
+            raise BadRequest("audit_older_than je broj dana")
+        filters.append(("(equipment_view.last_audit IS NULL OR equipment_view.last_audit < datetime('now', ?))",
+                        [f"-{int(days)} days"]))
+
+    return filters
 
 @app.route('/equipment', methods=['GET'])
 def get_equipment():
-    conn = sqlite3.connect('inventory.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, category, assigned_to, last_audit FROM equipment")
-    rows = cursor.fetchall()
-    conn.close()
-
-    equipment_list = []
-    for row in rows:
-        equipment_list.append({
-            "id": row[0],
-            "name": row[1],
-            "category": row[2],
-            "assigned_to": row[3],
-            "last_audit": row[4]
-        })
+    """ Oprema po id-u: ?after_id=&limit= za stranice, bez limita cijeli popis u komadima
+
+    Filteri: q (pretraga), category, assigned, audit_older_than; fields=id,name,... bira
+    polja. Odgovor ima ETag pa If-None-Match vraća 304 dok se ništa ne promijeni.
+    """
+    etag = etag_for("equipment", "employees")
+    if not_modified(etag):
+        return Response(status=304, headers={"ETag": f'W/"{etag}"'})
+
+    indexes, names = selected_fields(EQUIPMENT_FIELDS)
+    search_text = request.args.get('q', '').strip()
+    category = request.args.get('category')
+    after_id = int_arg('after_id', -1)
+    filters = equipment_filters()
+    limit = page_limit()
+
+    if search_text and request.args.get('sort') == 'rank':
+        # Relevance order can't be paged by id, only the best `limit` matches are returned
+        with db.connection() as conn:
+            rows = search_equipment(conn.cursor(), search_text, category=category, limit=limit or 100,
+                                    ranked=True, filters=filters)
+        return listing_response((rows, False), etag, indexes, names)
+
+    def page_query(after_id, limit):
+        return equipment_page_query(search_text, category, after_id, limit, filters)
 
-    return json_utf8(equipment_list)
+    if limit is None:
+        return stream_response(iter_pages(page_query, after_id, request.endpoint), etag, indexes, names)
+    return listing_response(fetch_page(page_query, after_id, limit), etag, indexes, names)
+
+def employees_page_query(company=None, after_id=-1, limit=100):
+    """ Jedna stranica djelatnika po id-u, opcionalno samo jedne tvrtke """
+    query = "SELECT id, first_name, last_name, company FROM employees WHERE id > ?"
+    params = [after_id]
+    if company:
+        query += " AND company = ?"
+        params.append(company)
+    return query + " ORDER BY id LIMIT ?", params + [limit]
 
 @app.route('/employees', methods=['GET'])
 def get_employees():
-    conn = sqlite3.connect('employees.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, first_name, last_name, company FROM employees")
-    rows = cursor.fetchall()
-    conn.close()
-
-    employees_list = []
-    for row in rows:
-        employees_list.append({
-            "id": row[0],
-            "first_name": row[1],
-            "last_name": row[2],
-            "company": row[3]
-        })
-    
-    print(employees_list)
-    return json_utf8(employees_list)
+    """ Djelatnici po id-u, isti parametri kao /equipment; filter je ?company= """
+    etag = etag_for("employees")
+    if not_modified(etag):
+        return Response(status=304, headers={"ETag": f'W/"{etag}"'})
+
+    indexes, names = selected_fields(EMPLOYEE_FIELDS)
+    company = request.args.get('company')
+    after_id = int_arg('after_id', -1)
+    limit = page_limit()
+
+    def page_query(after_id, limit):
+        return employees_page_query(company, after_id, limit)
+
+    if limit is None:
+        return stream_response(iter_pages(page_query, after_id, request.endpoint), etag, indexes, names)
+    return listing_response(fetch_page(page_query, after_id, limit), etag, indexes, names)
+
+# Change feed
+# Each worker compacts the change log at most this often, as part of a /changes request
+COMPACT_INTERVAL = 3600
+_last_compaction = 0.0
+
+def compact_changes():
+    global _last_compaction
+    if time.monotonic() - _last_compaction < COMPACT_INTERVAL:
+        return
+    _last_compaction = time.monotonic()
+    with db.connection() as conn:
+        removed = changes.compact(conn)
+    if removed:
+        logger.info("compacted change log", extra={"removed": removed})
+
+RESYNC_MESSAGES = {
+    changes.COMPACTED: "Kursor je prestar, potrebna je puna sinkronizacija",
+    changes.AHEAD: "Kursor je noviji od baze (baza je vraćena ili zamijenjena), potrebna je puna sinkronizacija",
+}
+
+@app.route('/changes', methods=['GET'])
+def get_changes():
+    """ Izmjene opreme i djelatnika nakon ?since=<seq>, najviše ?limit= redaka (vidi changes.py)
+
+    Bez since vraća samo trenutni kursor. Sljedeći zahtjev ide sa since=<next> dok je
+    more true. 410 s resync: true znači da klijent mora ponovno skinuti /equipment i
+    /employees i nastaviti od vraćenog seq; reason je "compacted" (kursor stariji od
+    sažetog dnevnika) ili "ahead" (kursor noviji od baze, npr. nakon vraćanja kopije).
+    """
+    since = request.args.get('since')
+    if since is not None and not since.isdigit():
+        raise BadRequest("since je seq iz prethodnog odgovora")
+    limit = page_limit() or MAX_PAGE_SIZE
+    compact_changes()
+
+    with db.connection() as conn:
+        if since is None:
+            return json_utf8({"next": changes.current_seq(conn)})
+        try:
+            since = int(since)
+            next_seq, more, changed = changes.changes_since(conn, since, limit)
+        except changes.ResyncRequired as e:
+            return json_utf8({"status": "error", "message": RESYNC_MESSAGES[e.reason],
+                              "resync": True, "reason": e.reason, "seq": e.seq}), 410
+
+    fields = {"equipment": EQUIPMENT_FIELDS, "employees": EMPLOYEE_FIELDS}
+    body = {"since": since, "next": next_seq, "more": more}
+    for table, (rows, deleted) in changed.items():
+        body[table] = {"upserts": [dict(zip(fields[table], row)) for row in rows], "deletes": deleted}
+    return json_utf8(body)
+
+@app.route('/export', methods=['GET'])
+def export():
+    """ Preuzimanje izvještaja: ?format=csv|xlsx|parquet, opcionalno q i category kao za /equipment """
+    file_format = request.args.get('format', 'csv')
+    if file_format not in FORMATS:
+        return jsonify({"status": "error", "message": f"Podržani formati: {', '.join(FORMATS)}"}), 400
+
+    search_text = request.args.get('q', '').strip()
+    category = request.args.get('category')
+    download_name = f"oprema.{file_format}"
+
+    # CSV goes out as it is read, the other formats need a finished file
+    if file_format == 'csv':
+        return Response(iter_csv(search_text, category), content_type='text/csv; charset=utf-8',
+                        headers={"Content-Disposition": f"attachment; filename={download_name}"})
+
+    # Anonymous temporary file, removed by the OS once send_file closes it
+    f = tempfile.TemporaryFile()
+    write_equipment(f, file_format, search_text, category)
+    f.seek(0)
+    return send_file(f, as_attachment=True, download_name=download_name)
+
+# Launch
+def run_production(host, port, workers, threads, cert_file, key_file, log_level):
+    """ Gunicorn s više procesa; TLS iz istih .pem datoteka kao i razvojni server """
+    try:
+        from gunicorn.app.base import BaseApplication
+        from gunicorn.glogging import Logger
+    except ImportError:
+        logger.warning("gunicorn nije instaliran, pokrećem jedan proces s dretvama")
+        app.run(host=host, port=port, threaded=True, ssl_context=(cert_file, key_file))
+        return
+
+    class InventoryLogger(Logger):
+        def setup(self, cfg):
+            super().setup(cfg)
+            # Gunicorn's own messages go through the same handler and format as ours
+            for log in (self.error_log, self.access_log):
+                log.handlers.clear()
+                log.propagate = True
+
+    def post_fork(server, worker):
+        # Pooled SQLite connections must not be shared between forked workers
+        db.close_all()
+        metrics.start_process()
+
+    def worker_exit(server, worker):
+        # Commit whatever is still queued before the worker goes away
+        stop_audit_queue()
+        metrics.stop_process()
+
+    # Workers count on their own, /metrics in any of them adds up the snapshots in this directory
+    metrics_dir = None
+    if metrics.ENABLED:
+        metrics_dir = tempfile.mkdtemp(prefix="inventory-metrics-")
+        metrics.share(metrics_dir)
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": "gthread",
+        "threads": threads,
+        "certfile": cert_file,
+        "keyfile": key_file,
+        "loglevel": log_level.lower(),
+        "accesslog": None,
+        "logger_class": InventoryLogger,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }
+
+    class InventoryServer(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    # Schema setup already ran on import, in this process; workers start with an empty pool
+    db.close_all()
+    logger.info("starting", extra={"bind": options["bind"], "workers": workers, "threads": threads})
+    master = os.getpid()
+    try:
+        InventoryServer().run()
+    finally:
+        # Workers unwind through here as well when they exit
+        if metrics_dir and os.getpid() == master:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+def main():
+    global AUDIT_MODE, AUDIT_JOURNAL
+
+    parser = argparse.ArgumentParser(description="Inventory API server")
+    parser.add_argument("--dev", action="store_true", help="Flask razvojni server s debuggerom i reloaderom")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--threads", type=int, default=THREADS, help="dretvi po procesu")
+    parser.add_argument("--cert", default=CERT_FILE)
+    parser.add_argument("--key", default=KEY_FILE)
+    parser.add_argument("--log-level", default=logs.LOG_LEVEL)
+    parser.add_argument("--log-format", choices=("json", "text"), default=logs.LOG_FORMAT)
+    parser.add_argument("--metrics", action=argparse.BooleanOptionalAction, default=metrics.ENABLED,
+                        help="brojači i histogrami na /metrics (Prometheus)")
+    parser.add_argument("--audit-mode", choices=("sync", "queued"), default=AUDIT_MODE)
+    parser.add_argument("--audit-journal", choices=audit.JOURNAL_MODES, default=AUDIT_JOURNAL)
+    args = parser.parse_args()
+
+    AUDIT_MODE, AUDIT_JOURNAL = args.audit_mode, args.audit_journal
+    metrics.enable(args.metrics)
+
+    logs.setup_logging(args.log_level, args.log_format)
+
+    # Scans acknowledged by a previous run but not committed before it stopped
+    replayed = audit.replay_journals()
+    if replayed:
+        logger.warning("replayed audit journal", extra={"scans": replayed})
+
+    if args.dev:
+        app.run(host=args.host, port=args.port, debug=True, ssl_context=(args.cert, args.key))
+    else:
+        run_production(args.host, args.port, args.workers, args.threads, args.cert, args.key, args.log_level)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True, ssl_context=('localhost.pem', 'localhost-key.pem'),)
\ No newline at end of file
+    main()
\ No newline at end of file
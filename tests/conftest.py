@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# db reads INVENTORY_DB when first imported: tests write to a scratch database, never to the working copy's
+os.environ["INVENTORY_DB"] = os.path.join(tempfile.mkdtemp(prefix="inventory_tests_"), "inventory.db")
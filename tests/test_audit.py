@@ -0,0 +1,55 @@
+""" Pisač reda za audit: greške baze ga ne smiju zaustaviti ni zaglaviti """
+import sqlite3
+import time
+
+import pytest
+
+import audit
+import db
+
+@pytest.fixture
+def audit_queue(tmp_path, monkeypatch):
+    db.setup_databases()
+    with db.transaction() as conn:
+        conn.execute("INSERT INTO equipment (name, category) VALUES ('Skener test', 'Miš')")
+    monkeypatch.setattr(audit.time, "sleep", lambda seconds: None)
+    queue = audit.AuditQueue(journal_dir=str(tmp_path), interval_ms=1)
+    yield queue
+    queue.stop(timeout=5)
+
+def known_id():
+    with db.connection() as conn:
+        return conn.execute("SELECT MAX(id) FROM equipment").fetchone()[0]
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def failing(error, calls):
+    def apply_audits(conn, scans):
+        calls.append(len(scans))
+        raise error
+    return apply_audits
+
+def test_persistent_error_sets_batch_aside(audit_queue, monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(audit, "apply_audits", failing(sqlite3.OperationalError("disk I/O error"), calls))
+    audit_queue.submit([{"equipment_id": known_id()}])
+
+    assert wait_for(lambda: audit_queue.counters["set_aside"] == 1)
+    # Once for the batch and once for the single scan, no retry loop
+    assert calls == [1, 1]
+    assert audit_queue._writer.is_alive()
+    assert list(tmp_path.glob("audit-failed-*.jsonl"))
+
+def test_locked_database_is_retried_a_bounded_number_of_times(audit_queue, monkeypatch):
+    calls = []
+    monkeypatch.setattr(audit, "LOCKED_RETRIES", 3)
+    monkeypatch.setattr(audit, "apply_audits", failing(sqlite3.OperationalError("database is locked"), calls))
+    audit_queue.submit([{"equipment_id": known_id()}])
+
+    assert wait_for(lambda: audit_queue.counters["set_aside"] == 1)
+    assert len(calls) == 4
+    assert audit_queue.counters["committed"] == 0
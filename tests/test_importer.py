@@ -0,0 +1,25 @@
+""" Uvoz opreme: retci s vlastitim id-em i bez njega u istom komadu """
+import db
+from importer import import_file
+
+def next_equipment_id():
+    with db.connection() as conn:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'equipment'").fetchone()
+        largest = conn.execute("SELECT IFNULL(MAX(id), 0) FROM equipment").fetchone()[0]
+    return max(row[0] if row else 0, largest) + 1
+
+def test_explicit_id_does_not_collide_with_reserved_ids(tmp_path):
+    db.setup_databases()
+    # The explicit id is the one the first row would have been given
+    explicit = next_equipment_id()
+    path = tmp_path / "oprema.csv"
+    path.write_text(f"naziv,kategorija,id\nAuto one,Monitor,\nExplicit,Monitor,{explicit}\n", encoding="utf-8")
+
+    summary = import_file(str(path), generate_qr=False)
+
+    assert summary["completed"] and summary["errors"] == []
+    assert summary["imported"] == 2
+    with db.connection() as conn:
+        rows = dict(conn.execute("SELECT name, id FROM equipment WHERE name IN ('Auto one', 'Explicit')"))
+    assert rows["Explicit"] == explicit
+    assert rows["Auto one"] > explicit
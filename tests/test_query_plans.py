@@ -0,0 +1,42 @@
+""" Planovi često korištenih upita: nijedan ne smije pasti na SCAN tablice ili privremeno sortiranje
+
+Isti upiti i pravila kao benchmarks/query_plans.py, nad sintetičkom bazom od
+QUERY_PLANS_ROWS komada opreme (zadano 100k). Baza se stvori jednom u privremenom
+direktoriju i zatim ponovno koristi.
+
+    python -m pytest tests/test_query_plans.py
+    QUERY_PLANS_ROWS=1000000 python -m pytest tests/test_query_plans.py
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+ROWS = int(os.environ.get("QUERY_PLANS_ROWS", 100_000))
+PATH = os.path.join(tempfile.gettempdir(), f"inventory_plans_{ROWS}.db")
+
+import db
+import server
+from generate_data import generate
+from query_plans import hot_queries, plan_problems
+
+if not os.path.exists(PATH):
+    # Built under another name first, an interrupted run must not leave a half-filled database behind
+    generate(PATH + ".partial", ROWS)
+    os.replace(PATH + ".partial", PATH)
+# A database kept from an earlier run may be behind the current schema
+db.setup_databases(PATH)
+
+QUERIES = hot_queries(server)
+
+@pytest.mark.parametrize("query, expected, full", [query[1:] for query in QUERIES],
+                         ids=[query[0] for query in QUERIES])
+def test_query_plan(query, expected, full):
+    sql, params = query
+    with db.connection(PATH) as conn:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    assert plan_problems(plan, expected, full) == [], " | ".join(plan)
@@ -0,0 +1,38 @@
+""" HTTP odgovori servera na neispravne zahtjeve """
+import pytest
+
+import db
+import server
+
+@pytest.fixture
+def client():
+    db.setup_databases()
+    return server.app.test_client()
+
+@pytest.mark.parametrize("body", [[1, 2], "tekst", 5, None])
+def test_audit_rejects_body_that_is_not_an_object(client, body):
+    response = client.post("/audit", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+def test_audit_without_equipment_id(client):
+    assert client.post("/audit", json={}).status_code == 400
+
+def test_csv_export_content_type(client):
+    response = client.get("/export?format=csv")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/csv; charset=utf-8"
+
+def test_changes_cursor_ahead_of_database(client):
+    current = client.get("/changes").get_json()["next"]
+    response = client.get(f"/changes?since={current + 1000}")
+    assert response.status_code == 410
+    body = response.get_json()
+    assert body["resync"] and body["reason"] == "ahead"
+    assert body["seq"] == current
+
+def test_changes_cursor_up_to_date(client):
+    current = client.get("/changes").get_json()["next"]
+    response = client.get(f"/changes?since={current}")
+    assert response.status_code == 200
+    assert response.get_json()["next"] == current